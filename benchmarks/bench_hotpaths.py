@@ -0,0 +1,250 @@
+# microbenchmarks for the hot paths of the simulation.
+# run:      python benchmarks/bench_hotpaths.py
+# save:     python benchmarks/bench_hotpaths.py --save benchmarks/baseline.json
+# compare:  python benchmarks/bench_hotpaths.py --compare benchmarks/baseline.json
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'src'))
+import antmath
+from ant import Realm, Colony
+from swarm import SwarmColony, sniff_matrix_sums
+from simulation import progress_time
+
+SEED = 12345
+
+def make_world(realm_size=(1000, 1000), sniff_radius=50, food_count=4, ants=30,
+    batched=False, lazy_decay=True, trails=8):
+    """
+    builds a realm with a colony in the middle, food_count food sources spread around the nest,
+    and trails of pheromone from the nest outwards, so that sniffing has something to find.
+    everything is derived from SEED, so that every run measures the same world.
+    """
+    realm = Realm(size=realm_size, evaporation=0.99, lazy_decay=lazy_decay, seed=SEED, halo=sniff_radius)
+    center = np.array(realm_size) // 2
+    colony_class = SwarmColony if batched else Colony
+    colony = colony_class(realm=realm, nest_position=tuple(center), sniff_radius=sniff_radius,
+        food_radius=30, starting_ants=ants, noise=0.5)
+
+    rng = np.random.default_rng(SEED)
+    for _ in range(food_count):
+        angle = rng.random() * 2 * np.pi
+        dist = 50 + rng.random() * 150
+        realm.spawn_food(center + dist * np.array([np.cos(angle), np.sin(angle)]), 100)
+
+    for k in range(trails):
+        angle = 2 * np.pi * k / trails
+        steps = np.arange(150)
+        points = center + np.outer(steps, [np.cos(angle), np.sin(angle)])
+        realm.deposits.put_many(points.astype(int), 10)
+    realm.update()
+
+    # spread the ants around the nest so that they are not all in the same place
+    offsets = rng.normal(scale=40, size=(ants, 2))
+    if batched:
+        colony.ant_position += offsets
+        colony.next_position[:] = colony.ant_position
+    else:
+        for ant, offset in zip(colony.ants, offsets):
+            ant.position = ant.position + offset
+    return realm, colony
+
+def bench_walk(ants, sniff_radius, target):
+    realm, colony = make_world(sniff_radius=sniff_radius, ants=ants)
+    goal = colony.position if target else None
+    def run():
+        for ant in colony.ants:
+            ant.walk(goal)
+    return run
+
+def bench_sniff(ants, sniff_radius):
+    realm, colony = make_world(sniff_radius=sniff_radius, ants=ants)
+    def run():
+        for ant in colony.ants:
+            ant.sniff()
+    return run
+
+def bench_sniff_matrix(ants, method):
+    """
+    the sniffmatrix step of SwarmColony._sniff. slices multiplies the window of one ant at a time,
+    batched gathers the windows of several ants and multiplies them in one product, as the swarm does.
+    """
+    realm, colony = make_world(ants=ants, batched=True)
+    r = colony.sniff_radius
+    positions = colony.ant_position.astype(int) + realm.halo
+    land, m = realm.land, colony.context.sniffmatrix
+    if method == "slices":
+        def run():
+            out = np.zeros(len(positions), dtype=m.dtype)
+            for j, (x, y) in enumerate(positions):
+                out[j] = np.sum(np.multiply(land[x-r:x+r, y-r:y+r], m))
+    else:
+        def run():
+            sniff_matrix_sums(land, positions, r, colony.context.sniff_columns)
+    return run
+
+def bench_search_food(ants, food_count):
+    realm, colony = make_world(food_count=food_count, ants=ants)
+    def run():
+        for ant in colony.ants:
+            ant.search_food()
+    return run
+
+def bench_detect_straight_line(window):
+    rng = np.random.default_rng(SEED)
+    image = np.zeros((window, window))
+    image[np.arange(window), (np.arange(window) * 0.7).astype(int)] = 10
+    image += rng.random((window, window)) * (rng.random((window, window)) < 0.05)
+    def run():
+        antmath.detect_straight_line(image)
+    return run
+
+def bench_random(size):
+    rng = np.random.default_rng(SEED)
+    if size == 1:
+        def run():
+            antmath.random(rng=rng)
+    else:
+        def run():
+            antmath.random(size=size, rng=rng)
+    return run
+
+def bench_realm_update(realm_size, deposits, lazy_decay):
+    realm, colony = make_world(realm_size=realm_size, ants=0, lazy_decay=lazy_decay)
+    rng = np.random.default_rng(SEED)
+    positions = (rng.random((deposits, 2)) * realm_size).astype(int)
+    def run():
+        realm.deposits.put_many(positions, 10)
+        realm.update()
+    return run
+
+def bench_tick(ants, batched, food_count):
+    realm, colony = make_world(ants=ants, batched=batched, food_count=food_count)
+    colonies = [colony]
+    def run():
+        progress_time(realm, colonies)
+    return run
+
+def cases(quick=False):
+    """
+    every benchmark case as (name, parameters, setup function).
+    """
+    ant_counts = [30] if quick else [30, 300]
+    radii = [25, 50]
+    food_counts = [4, 100]
+    result = []
+    for ants in ant_counts:
+        for r in radii:
+            result.append(("ant.walk", {"ants": ants, "sniff_radius": r, "target": False}, bench_walk))
+        result.append(("ant.walk", {"ants": ants, "sniff_radius": 50, "target": True}, bench_walk))
+        for r in radii:
+            result.append(("ant.sniff", {"ants": ants, "sniff_radius": r}, bench_sniff))
+        for method in ["slices", "batched"]:
+            result.append(("swarm.sniff_matrix", {"ants": ants, "method": method}, bench_sniff_matrix))
+        for f in food_counts:
+            result.append(("ant.search_food", {"ants": ants, "food_count": f}, bench_search_food))
+    for r in radii:
+        result.append(("antmath.detect_straight_line", {"window": 2*(r//5)}, bench_detect_straight_line))
+    for size in [1, 1000]:
+        result.append(("antmath.random", {"size": size}, bench_random))
+    for size in [(1000, 1000)] if quick else [(1000, 1000), (2000, 2000)]:
+        for lazy in [False, True]:
+            result.append(("realm.update", {"realm_size": size, "deposits": 300, "lazy_decay": lazy},
+                bench_realm_update))
+    for ants in ant_counts:
+        for batched in [False, True]:
+            result.append(("progress_time", {"ants": ants, "batched": batched, "food_count": 4}, bench_tick))
+    return result
+
+def case_key(name, params):
+    return name + "[" + ",".join(f"{k}={v}" for k, v in sorted(params.items())) + "]"
+
+def measure(run, min_time=0.05, repeats=5):
+    """
+    calls run in loops of at least min_time, and returns the per call time of every repeat in seconds.
+    """
+    run() # warm up caches and lazily built tables
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            run()
+        elapsed = (time.perf_counter_ns() - start) / 1e9
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2
+    times = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            run()
+        times.append((time.perf_counter_ns() - start) / 1e9 / loops)
+    return times
+
+def run_benchmarks(quick=False, pattern=None):
+    results = {}
+    for name, params, setup in cases(quick):
+        key = case_key(name, params)
+        if pattern and pattern not in key:
+            continue
+        times = measure(setup(**params))
+        results[key] = {"min": min(times), "median": float(np.median(times))}
+        print(f"{key:80s} {results[key]['min']*1e6:12.1f} us")
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    prints the ratio of every case to the baseline, and returns the cases that got slower than threshold.
+    the minimum over the repeats is compared, since it is the least affected by other load on the machine.
+    """
+    regressions = []
+    print(f"\n{'case':80s} {'baseline':>12s} {'now':>12s} {'ratio':>8s}")
+    for key, now in results.items():
+        if key not in baseline["results"]:
+            print(f"{key:80s} {'-':>12s} {now['min']*1e6:10.1f}us {'new':>8s}")
+            continue
+        before = baseline["results"][key]["min"]
+        ratio = now["min"] / before
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{key:80s} {before*1e6:10.1f}us {now['min']*1e6:10.1f}us {ratio:8.2f}{flag}")
+    print(f"\n{len(regressions)} regressions (slower than {threshold:.2f}x the baseline)")
+    for key in regressions:
+        print(f"    {key}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the simulation hot paths.")
+    parser.add_argument("--quick", action="store_true", help="only the smaller parameters")
+    parser.add_argument("-k", dest="pattern", default=None, help="only cases containing this text")
+    parser.add_argument("--save", default=None, help="write the results as json to this file")
+    parser.add_argument("--compare", default=None, help="compare against a saved json file")
+    parser.add_argument("--threshold", type=float, default=1.2,
+        help="a case is a regression when it is this many times slower than the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick, args.pattern)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "processor": platform.processor() or platform.machine()},
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
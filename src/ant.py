@@ -1,9 +1,14 @@
 import numpy as np
 import antmath
-from queue import SimpleQueue
+from scipy.spatial import cKDTree
+from scipy.signal import fftconvolve
 from enum import Enum
+from tiledland import TiledLand
+from tickprofiler import TickProfiler
 
 class Food():
+    __slots__ = ("position", "amount")
+
     def __init__(self, position, amount):
         self.position = position
         self.amount = amount
@@ -28,53 +33,351 @@ class Food():
             }
         }
 
+class FoodIndex():
+    """
+    k-d tree over the positions of the food in the realm, used to find the nearest food of many ants at once.
+    the tree is rebuilt lazily after food was added or removed.
+    """
+    def __init__(self):
+        self.positions = np.zeros((0, 2))
+        self.tree = None
+        self.dirty = True
+
+    def rebuild(self, food_list):
+        self.positions = np.array([f.position for f in food_list], dtype=float).reshape(-1, 2)
+        self.tree = cKDTree(self.positions) if len(self.positions) else None
+        self.dirty = False
+
+    def query(self, positions, max_distance):
+        """
+        returns the index of the nearest food closer than max_distance for each position (-1 if none),
+        and the distance to it.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if self.tree is None or len(positions) == 0:
+            return np.full(len(positions), -1), np.full(len(positions), np.inf)
+        dist, index = self.tree.query(positions, k=1, distance_upper_bound=max_distance)
+        found = dist < max_distance
+        return np.where(found, index, -1), dist
+
+class DepositBuffer():
+    """
+    collects the pheromone deposits made during a tick, so that they can be added to the land at once.
+    positions, amounts and the pheromone channel of each deposit are kept in preallocated arrays,
+    which grow when they are full.
+    """
+    def __init__(self, capacity=1024):
+        self.positions = np.zeros((capacity, 2), dtype=np.intp)
+        self.amounts = np.zeros(capacity)
+        self.channels = np.zeros(capacity, dtype=np.intp)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, n):
+        capacity = len(self.amounts)
+        if self.count + n <= capacity:
+            return
+        while capacity < self.count + n:
+            capacity *= 2
+        positions = np.zeros((capacity, 2), dtype=np.intp)
+        amounts = np.zeros(capacity)
+        channels = np.zeros(capacity, dtype=np.intp)
+        positions[:self.count] = self.positions[:self.count]
+        amounts[:self.count] = self.amounts[:self.count]
+        channels[:self.count] = self.channels[:self.count]
+        self.positions, self.amounts, self.channels = positions, amounts, channels
+
+    def put(self, position, amount, channel=0):
+        self._reserve(1)
+        self.positions[self.count] = position
+        self.amounts[self.count] = amount
+        self.channels[self.count] = channel
+        self.count += 1
+
+    def put_many(self, positions, amounts, channel=0):
+        """
+        positions is a N times 2 array, amounts is either a single value or an array of N values.
+        """
+        n = len(positions)
+        self._reserve(n)
+        self.positions[self.count:self.count+n] = positions
+        self.amounts[self.count:self.count+n] = amounts
+        self.channels[self.count:self.count+n] = channel
+        self.count += n
+
+    def flush(self, land, scale=1.0, offset=0):
+        """
+        adds all deposits to land and empties the buffer.
+        land is either a channels times height times width array, or a list with the land of each channel.
+        offset is added to the positions, the width of the halo around the stored land.
+        deposits on the same cell are summed before they are added, so duplicates accumulate correctly.
+        """
+        if self.count == 0:
+            return
+        p = self.positions[:self.count] + offset
+        c = self.channels[:self.count]
+        a = self.amounts[:self.count]
+        if isinstance(land, list):
+            for channel in np.unique(c):
+                mask = c == channel
+                self._add(land[channel], (p[mask, 0], p[mask, 1]), a[mask], scale)
+        else:
+            self._add(land, (c, p[:, 0], p[:, 1]), a, scale)
+        self.count = 0
+
+    @staticmethod
+    def _add(land, index, amounts, scale):
+        flat = np.ravel_multi_index(index, land.shape)
+        cells, inverse = np.unique(flat, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=amounts)
+        index = np.unravel_index(cells, land.shape)
+        land[index] += (sums / scale).astype(land.dtype)
+
 class Realm():
     """
     The world where our ants and nests live in.
     Time is defined here, so that we don't need to define a global time variable.
+
+    With lazy_decay, the pheromone is not evaporated cell by cell every tick.
+    Instead, land is stored divided by land_scale, and only land_scale is reduced every tick.
+    Use get_slice() to read the actual pheromone amount.
+
+    With sniff_field_interval > 0, the land is convolved with the sniffmatrix once every
+    sniff_field_interval ticks, and ants read their sniff vector from that field instead of
+    multiplying their own window with the matrix.
+
+    All randomness of a simulation comes from seed. The realm draws from its own rng,
+    and every colony gets an independent stream from spawn_rng().
+
+    Every colony leaves and smells pheromone in its own channel, claimed with claim_channel().
+    The land of all channels is one channels times height times width array, stack, so that
+    evaporation and the deposits of all colonies are one operation each. lands[channel] is the land of a channel.
+    channels is the number of colonies the stack is allocated for, it grows when more colonies claim a channel.
+
+    The land is stored with a halo of zeros, halo cells wide, around the map. Positions are map coordinates,
+    the stored land at map position (x, y) is lands[channel][x + halo, y + halo].
+    With a halo at least as wide as the sniff radius, every window around a position on the map
+    has the full size, so ants can sniff right up to the edge.
+
+    With tile_size, the land of each channel is a TiledLand, which only stores the tiles that hold pheromone.
+    Every retire_interval ticks, tiles where all pheromone decayed below retire_epsilon are freed.
+
+    dtype is the precision the land is stored in, np.float32 halves the memory traffic of the land.
+
+    profiler is a TickProfiler shared by everything in the realm, it is disabled unless enabled is set.
     """
-    def __init__(self, size, evaporation=0.95):
+    def __init__(self, size, evaporation=0.95, lazy_decay=False, sniff_field_interval=0, seed=None,
+        tile_size=None, retire_epsilon=1e-6, retire_interval=100, dtype=np.float64, halo=0, channels=1):
         self.time = 0
         self.time_increment = 1 # the amount of time to progress per tick.
         
-        self.land = np.zeros(size)
-        self.next_land_queue = SimpleQueue()
+        self.size = tuple(size)
+        self.halo = halo
+        self.storage_shape = (self.size[0] + 2*halo, self.size[1] + 2*halo)
+        self.tile_size = tile_size
+        self.dtype = np.dtype(dtype)
+        self.claimed_channels = 0
+        self._allocate_channels(channels)
+        self.land_scale = 1.0
+        self.retire_epsilon = retire_epsilon
+        self.retire_interval = retire_interval
+        self.deposits = DepositBuffer()
 
         self.evaporate_rate = evaporation
+        self.lazy_decay = lazy_decay
+        # fold land_scale into land before stored values grow too large for dtype.
+        # a deposit is stored as amount / land_scale, which is kept below the square root of the largest value,
+        # so that the sums of many deposits still fit. float64 keeps renormalizing at the earlier 1e-100.
+        self.renormalize_below = max(1e-100, Ant.pheromone_amount / np.sqrt(np.finfo(self.dtype).max))
         self.food_list = []
-        self.flag_food_removed = False
+        self.food_index = FoodIndex()
+
+        self.sniff_field_interval = sniff_field_interval
+        self.sniff_fields = {} # sniffmatrix shape and dtype -> (field, time it was built)
+
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = self.spawn_rng()
+        self.profiler = TickProfiler()
+
+    def _allocate_channels(self, channels):
+        if self.tile_size:
+            self.stack = None
+            self.lands = [TiledLand(self.storage_shape, self.tile_size, self.dtype) for _ in range(channels)]
+        else:
+            self.stack = np.zeros((channels,) + self.storage_shape, dtype=self.dtype)
+            self.lands = list(self.stack)
+
+    def set_lands(self, lands):
+        """
+        replaces the land of all channels, lands is a channels times height times width array including the halo.
+        """
+        if self.tile_size:
+            self.stack = None
+            self.lands = [TiledLand.from_dense(land, self.tile_size) for land in lands]
+        else:
+            self.stack = lands
+            self.lands = list(lands)
+        self.sniff_fields = {}
+
+    @property
+    def land(self):
+        """
+        the stored land of the first channel, which is the only one when there is a single colony.
+        """
+        return self.lands[0]
+
+    @property
+    def channels(self):
+        return len(self.lands)
+
+    def claim_channel(self):
+        """
+        returns a pheromone channel for a new colony, adding a channel to the stack if all are taken.
+        adding a channel copies the whole stack, so pass the number of colonies to the realm when it is known.
+        """
+        channel = self.claimed_channels
+        if channel >= self.channels:
+            if self.tile_size:
+                self.lands.append(TiledLand(self.storage_shape, self.tile_size, self.dtype))
+            else:
+                stack = np.zeros((channel + 1,) + self.storage_shape, dtype=self.dtype)
+                stack[:channel] = self.stack
+                self.stack = stack
+                self.lands = list(stack)
+            self.sniff_fields = {}
+        self.claimed_channels += 1
+        return channel
+
+    def spawn_rng(self):
+        """
+        returns a new random generator, independent of all generators spawned before.
+        """
+        return np.random.default_rng(self.seed_sequence.spawn(1)[0])
 
     def spawn_food(self, position, amount):
         self.food_list.append(Food(position, amount))
+        self.food_index.dirty = True
+
+    def search_food(self, positions, max_distance):
+        """
+        finds the nearest food within max_distance for every position in the N times 2 array.
+        returns the indices into food_list (-1 if there is no food nearby) and the distances.
+        """
+        if self.food_index.dirty:
+            self.food_index.rebuild(self.food_list)
+        return self.food_index.query(positions, max_distance)
 
     def check_boundary(self, position):
         p = np.array(position)
-        if (p > self.land.shape).any() or (p < np.array([0,0])).any():
+        if (p > self.size).any() or (p < np.array([0,0])).any():
             return False
         else:
             return True
 
+    def get_slice(self, left, right, top, bottom, channel=None):
+        """
+        returns the pheromone amount of the channel in the given region of the map.
+        without a channel, the amount of all channels together is returned.
+        """
+        h = self.halo
+        left, right, top, bottom = left + h, right + h, top + h, bottom + h
+        if channel is None and self.channels == 1:
+            channel = 0
+        if channel is not None:
+            region = self.lands[channel][left:right, top:bottom]
+        elif self.stack is not None:
+            region = self.stack[:, left:right, top:bottom].sum(axis=0)
+        else:
+            region = sum(land[left:right, top:bottom] for land in self.lands)
+        if self.land_scale == 1:
+            return region
+        return region * self.land_scale
+
+    def _build_sniff_field(self, sniffmatrix):
+        """
+        correlates the stored land of every channel with the sniffmatrix in one pass, so that field[c, x, y]
+        is the sum of the sniffmatrix times the window lands[c][x-r:x+r, y-r:y+r], with zeros outside of the storage.
+        """
+        m = sniffmatrix
+        r0, r1 = m.shape[0]//2, m.shape[1]//2
+        stack = self.stack if self.stack is not None else np.stack([np.asarray(land) for land in self.lands])
+        full = fftconvolve(stack, m[None, ::-1, ::-1], mode="full", axes=(1, 2))
+        h, w = self.storage_shape
+        return full[:, r0-1:r0-1+h, r1-1:r1-1+w]
+
+    def get_sniff_vectors(self, positions, sniffmatrix, channel=0):
+        """
+        returns the complex sniff vector for each position in the N times 2 array, read from the sniff field of the channel.
+        the field is rebuilt when it is older than sniff_field_interval ticks.
+        """
+        key = (sniffmatrix.shape, sniffmatrix.dtype.name)
+        field, built = self.sniff_fields.get(key, (None, None))
+        if field is None or self.time - built >= self.sniff_field_interval:
+            field = self._build_sniff_field(sniffmatrix)
+            self.sniff_fields[key] = (field, self.time)
+        p = np.asarray(positions).reshape(-1, 2).astype(int) + self.halo
+        x = np.clip(p[:, 0], 0, self.storage_shape[0]-1)
+        y = np.clip(p[:, 1], 0, self.storage_shape[1]-1)
+        return field[channel, x, y] * self.land_scale
+
+    def renormalize(self):
+        """
+        applies the pending decay to the whole land at once.
+        """
+        self._scale_lands(self.land_scale)
+        for field, _ in self.sniff_fields.values():
+            field *= self.land_scale
+        self.land_scale = 1.0
+
+    def _scale_lands(self, factor):
+        if self.stack is not None:
+            self.stack *= factor
+        else:
+            for land in self.lands:
+                land *= factor
+
     def update(self):
         """
         reduces the pheromone exponentially.
         """
-        self.land = np.dot(self.land, self.evaporate_rate) # exponential decay
-        while not self.next_land_queue.empty():
-            p, a = self.next_land_queue.get()
-            self.land[p] += a
+        self.profiler.start("evaporation")
+        if self.lazy_decay:
+            self.land_scale *= self.evaporate_rate
+            if self.land_scale < self.renormalize_below:
+                self.renormalize()
+        else:
+            self._scale_lands(self.evaporate_rate) # exponential decay
+        self.profiler.stop("evaporation")
+        self.profiler.start("deposits")
+        self.deposits.flush(self.stack if self.stack is not None else self.lands, self.land_scale, self.halo)
+        self.profiler.stop("deposits")
+        if self.tile_size and self.time % self.retire_interval == 0:
+            self.profiler.start("evaporation.retire")
+            for land in self.lands:
+                land.retire(self.retire_epsilon / self.land_scale)
+            self.profiler.stop("evaporation.retire")
         
-        self.food_list[:] = [f for f in self.food_list if not np.isclose(f.amount, 0)]
+        amounts = np.fromiter((f.amount for f in self.food_list), dtype=float, count=len(self.food_list))
+        depleted = np.isclose(amounts, 0)
+        if depleted.any():
+            self.food_list[:] = [f for f, d in zip(self.food_list, depleted) if not d]
+            self.food_index.dirty = True
         self.time += self.time_increment
 
 class Entity():
+    """
+    something that lives in the realm. do() decides the next state, update() applies it.
+    the state that changes during a tick is double buffered: for every name in buffered there is
+    a next_<name> slot next to the <name> slot. do() writes the next value, and update() swaps it in.
+    a next value of None means that nothing will be changed.
+    """
+    __slots__ = ("realm",)
+    buffered = ()
+
     def __init__(self, realm):
         self.realm = realm
-        self.states = {}
-        self.next_states = {}
-
-    def _create_state(self, key, value):
-        self.states[key] = value
-        self.next_states[key] = None
 
     def do(self):
         pass
@@ -82,18 +385,18 @@ class Entity():
     def update(self):
         """
         update all the pending state changes, and set the future states undefined.
-        if the future state is undefined, that means nothing will be changed.
         """
-        for key in self.states:
-            if self.next_states[key] is not None:
-                self.states[key] = self.next_states[key]
-                self.next_states[key] = None
+        for name in self.buffered:
+            next_name = "next_" + name
+            value = getattr(self, next_name)
+            if value is not None:
+                setattr(self, name, value)
+                setattr(self, next_name, None)
     
     def get_position(self):
-        if "position" in self.states:
-            return (self.states["position"][0], self.states["position"][1])
-        else:
+        if not hasattr(self, "position"):
             raise ValueError("undefined position")
+        return (self.position[0], self.position[1])
 
     def get_heading(self):
         return 0.25
@@ -108,33 +411,47 @@ class AntModes(Enum):
     returning_due_to_distance = 3
 
 class Ant(Entity):
+    __slots__ = ("birth_time", "nest", "chaotic_constant", "smell_range", "food_range", "rng",
+        "heading", "turning", "mode", "position", "next_position", "food", "next_food",
+        "arrow_pre_heading", "arrow_sniff")
+    buffered = ("position", "food")
+
+    # constants to be tuned
+    grab_amount = 10
+    pheromone_amount = 10
+    walk_speed = 1
+    threshold_sniff = 1
+    mix_home = 0.5
+    too_far_away = 300
+
     def __init__(self, nest, chaotic_constant = 4):
         super(Ant, self).__init__(nest.realm)
-        assert antmath.sniffmatrix is not None, "Antmath matrix was not initialised!"
         self.birth_time = self.realm.time #can be used to determine the age of the ant
         self.nest = nest #pointer to the nest object.
-
-        # constants to be tuned
-        self.grab_amount = 10
-        self.pheromone_amount = 10
-        self.walk_speed = 1
         self.chaotic_constant = chaotic_constant
         self.smell_range = self.nest.sniff_radius
         self.food_range = self.nest.food_radius
-        self.threshold_sniff = 1
-        self.mix_home = 0.5
-        self.too_far_away = 300
         
         # states of the ant
-        self.heading = np.random.rand()
-        self.turning = np.random.rand()
-        while self.turning == 0: self.turning = np.random.rand()
-        self._create_state("position", np.array(nest.position))
-        self._create_state("food", 0)
+        self.rng = nest.rng
+        self.heading = self.rng.random()
+        self.turning = self.rng.random()
+        while self.turning == 0: self.turning = self.rng.random()
+        self.position = np.array(nest.position)
+        self.next_position = None
+        self.food = 0
+        self.next_food = None
         self.mode = AntModes.searching
 
-        # used for debugs
-        self.arrows = {}
+        # used for debugs, see get_arrows
+        self.clear_arrows()
+
+    def update(self):
+        # Entity.update written out for the two buffered fields, since it runs for every ant every tick
+        if self.next_position is not None:
+            self.position, self.next_position = self.next_position, None
+        if self.next_food is not None:
+            self.food, self.next_food = self.next_food, None
 
     def do(self):
         """
@@ -154,7 +471,7 @@ class Ant(Entity):
         if self.mode == AntModes.searching:
             if not search_and_grab():
                 self.walk()
-                if np.linalg.norm(self.states["position"] - self.nest.position) > self.too_far_away:
+                if np.linalg.norm(self.position - self.nest.position) > self.too_far_away:
                     self.mode = AntModes.returning_due_to_distance
 
         elif self.mode == AntModes.returning:
@@ -178,6 +495,7 @@ class Ant(Entity):
         considering the current state of the and the surroundings, the ant can walk through the realm.
         this will set its next position state, which gets updated when update() is called.
         """
+        self.realm.profiler.start("walk")
         self.clear_arrows()
         def angle_towards(heading, target, maxturn=0.05, mix=1):
             diff = target - heading
@@ -190,7 +508,7 @@ class Ant(Entity):
 
         # intermediate heading.
         c_base = self.turning * 4 / self.chaotic_constant - 0.5
-        r_base = antmath.random() - 0.5
+        r_base = antmath.random(rng=self.rng) - 0.5
         h_base = antmath.mix([c_base, 1-self.nest.noise], [r_base, self.nest.noise]) / 10 # division limits the maximum angle
         self.heading += h_base # prenoise
 
@@ -199,75 +517,81 @@ class Ant(Entity):
             if mag_sniff > self.threshold_sniff: # the ant has sniffed anything of significance.
                 self.heading += angle_towards(self.heading, s_base, mix=0.5)
         else:
-            self.set_arrows("pre-heading", self.heading, (255,255,255), 3)
+            self.arrow_pre_heading = self.heading
             self.heading += angle_towards(self.heading, self.direction_to_target(target), maxturn=0.2, mix=0.8)
 
-        h = antmath.imag_to_array(np.e ** (2j * np.pi * self.heading))
-        next_position = self.states["position"] + antmath.unitvector(h) * self.walk_speed
-        
-        self.set_arrows("heading", self.heading, (0,0,255), 3)
-        if np.linalg.norm(self.states["position"] - self.nest.position) > 1:
-            self.set_arrows("home", self.direction_to_target(self.nest.position), (0,255,255), 5)
+        h = antmath.headings_to_vectors(self.heading, self.nest.context.heading_table)
+        next_position = self.position + h * self.walk_speed
 
         if self.realm.check_boundary(next_position):
-            self.next_states["position"] = next_position
+            self.next_position = next_position
+        elif self.nest.boundary == "bounce":
+            # the ant bumps into the edge of the map, stays where it is and turns around
+            self.heading += 0.5
+            self.next_position = self.position
         else:
             raise IndexError("The ant has escaped the map")
+        self.realm.profiler.stop("walk")
 
     def direction_to_target(self, target):
-        p = self.states["position"]
+        p = self.position
         return antmath.direction_to_exponent(target-p)
 
     def make_pheromones(self):
         # create pheromone in current position.
-        p = tuple(self.states["position"].astype(int))
-        self.realm.next_land_queue.put((p, self.pheromone_amount))
+        p = tuple(self.position.astype(int))
+        self.realm.deposits.put(p, self.pheromone_amount, self.nest.channel)
 
     def at_home(self):
-        if np.linalg.norm(self.states["position"] - self.nest.position) < self.nest.range:
+        if np.linalg.norm(self.position - self.nest.position) < self.nest.range:
             return True
         else: return False
 
     def search_food(self):
         """
         Looks for food in the nearby region.
-        This method loops through all the food in the list, checks if it is nearby, and take it.
-        also returns the distance and direction towards the nearby food.
-        """
-        p = self.states["position"]
-        for food in self.realm.food_list:
-            location = food.position
-            dist = np.linalg.norm(p - location)
-            if dist < self.food_range:
-                return food, dist
+        This method asks the realm for the nearest food within food range.
+        also returns the distance towards the nearby food.
+        """
+        self.realm.profiler.start("search_food")
+        index, dist = self.realm.search_food(self.position, self.food_range)
+        self.realm.profiler.stop("search_food")
+        if index[0] >= 0:
+            return self.realm.food_list[index[0]], dist[0]
         return None, None
 
     def get_current_slice(self, r):
-        #BUG
-        p = self.states["position"].astype(int)
+        """
+        the 2r times 2r window of the land of the colony around the ant.
+        it has the full size wherever the ant is when the halo of the realm is at least r.
+        """
+        p = self.position.astype(int)
         left, right = p[0] - r, p[0] + r
         top, bottom = p[1] - r, p[1] + r
-        return self.realm.land[left:right, top:bottom]
+        return self.realm.get_slice(left, right, top, bottom, self.nest.channel)
 
     def sniff(self):
         """
         returns imaginary direction of the deterimined "strongest smell"
         refer to antmath.py for detailed implementation of the sniffmatrix.
         
-        warning: this method does not consider that the sniffmatrix can be outside of map.
-        index can get out of bound when an ant is nearby the edge.
+        near the edge of the map, the window is only complete when the halo of the realm
+        is at least the sniff radius. with the "remove" boundary of the colony, ants are removed
+        before they get there, so a centered nest does not need a halo.
         """
         def matrix_sum(a, m):
-            if a.shape != m.shape:
-                print(self.states["position"])
+            assert a.shape == m.shape, f"truncated sniff window at {self.position}"
             return np.sum(np.multiply(a, m))
 
         def amount(x):
             return np.linalg.norm(x)
         
+        profiler = self.realm.profiler
         # start by assuming that the ant is on a trail
+        profiler.start("sniff.trail")
         smaller_slice = self.get_current_slice(self.smell_range//5)
         line = antmath.detect_straight_line(smaller_slice)
+        profiler.stop("sniff.trail")
         if line:
             dth = self.direction_to_target(self.nest.position)
             if abs(dth-line) < 0.25: #line direction is towards home
@@ -275,16 +599,22 @@ class Ant(Entity):
             else:
                 direction = line
             magnitude = np.sum(smaller_slice)
-            self.set_arrows("sniff", direction, (255, 0, 0), magnitude/10)
+            self.arrow_sniff = (direction, (255, 0, 0), magnitude/10)
             return direction, magnitude
         else:
-            bigger_slice = self.get_current_slice(self.smell_range)
-            direction_raw = matrix_sum(bigger_slice, antmath.sniffmatrix)
+            profiler.start("sniff.matrix")
+            if self.realm.sniff_field_interval:
+                direction_raw = self.realm.get_sniff_vectors(self.position, self.nest.context.sniffmatrix,
+                    self.nest.channel)[0]
+            else:
+                bigger_slice = self.get_current_slice(self.smell_range)
+                direction_raw = matrix_sum(bigger_slice, self.nest.context.sniffmatrix)
             magnitude = amount(direction_raw)
+            profiler.stop("sniff.matrix")
 
             if magnitude > 0.1:
                 direction = antmath.complex_to_exponent(direction_raw)
-                self.set_arrows("sniff", direction, (255, 255, 0), magnitude/20)
+                self.arrow_sniff = (direction, (255, 255, 0), magnitude/20)
                 return direction, magnitude
             else:
                 # there is no pheromone nearby
@@ -296,40 +626,59 @@ class Ant(Entity):
         requires that the food object was already chosen. Use search_food to check food in nearby region.
         """
         grabbed = food.take(self.grab_amount)
-        self.next_states["food"] = grabbed
+        self.next_food = grabbed
 
     def drop(self):
         """
         drop the food, and increase the food stored in the colony
         """
-        self.nest.new_food += self.states["food"]
-        self.next_states["food"] = 0
+        self.nest.new_food += self.food
+        self.next_food = 0
 
     def get_heading(self):
         return self.heading
 
-    def set_arrows(self, name, heading, color, intensity):
-        self.arrows[name] = {
-            "heading": heading,
-            "color": color,
-            "intensity": intensity
-        }
-
     def clear_arrows(self):
-        self.arrows = {}
+        self.arrow_pre_heading = None
+        self.arrow_sniff = None # direction, color and intensity
 
     def get_arrows(self):
-        return self.arrows
+        """
+        the debug arrows of the last walk. only the values are kept during the walk,
+        the dictionary is built when the visualizer asks for it.
+        """
+        def arrow(heading, color, intensity):
+            return {"heading": heading, "color": color, "intensity": intensity}
+        arrows = {}
+        if self.arrow_pre_heading is not None:
+            arrows["pre-heading"] = arrow(self.arrow_pre_heading, (255,255,255), 3)
+        if self.arrow_sniff is not None:
+            arrows["sniff"] = arrow(*self.arrow_sniff)
+        arrows["heading"] = arrow(self.heading, (0,0,255), 3)
+        if np.linalg.norm(self.position - self.nest.position) > 1:
+            arrows["home"] = arrow(self.direction_to_target(self.nest.position), (0,255,255), 5)
+        return arrows
         
 
 class Colony(Entity):
+    __slots__ = ("position", "range", "noise", "chaotic_constant", "sniff_radius", "food_radius",
+        "context", "rng", "channel", "boundary", "ants", "new_ants", "food", "new_food")
+
     def __init__(self, realm, nest_position, sniff_radius, food_radius,
         starting_ants=0, starting_food=0,
-        noise=0, chaotic_constant=4):
+        noise=0, chaotic_constant=4, context=None, rng=None, boundary="remove"):
         """
         [static states]
         position: the position of the nest on the map
         realm: pointer to the map entity. This exists so that the ants can leave traces on this realm.
+        context: antmath.Context with the sniffmatrix, built for sniff_radius if not given
+        rng: random generator of the colony and its ants, spawned from the realm if not given
+        channel: the pheromone channel of the realm the ants of this colony smell and deposit into
+        boundary: what happens to ants near the edge of the map.
+            "remove" removes ants that are more than half the map size minus 60 away from the nest,
+            as the experiments in results/ were run. an ant that still walks off the map raises IndexError.
+            "bounce" keeps all ants, an ant whose step would leave the map stays and turns around.
+            this needs a realm with a halo of at least sniff_radius, so that ants can sniff up to the edge.
 
         [children entities]
         ants: list of ants that belong to this colony
@@ -345,6 +694,14 @@ class Colony(Entity):
         self.chaotic_constant = chaotic_constant
         self.sniff_radius = sniff_radius
         self.food_radius = food_radius
+        self.context = context if context is not None else antmath.Context(sniff_radius*2, sniff_radius*2)
+        self.rng = rng if rng is not None else realm.spawn_rng()
+        self.channel = realm.claim_channel()
+        if boundary not in ("remove", "bounce"):
+            raise ValueError(f"unknown boundary {boundary}")
+        if boundary == "bounce" and realm.halo < sniff_radius:
+            raise ValueError("bouncing ants need a realm with a halo of at least the sniff radius")
+        self.boundary = boundary
         
         #children entities
         self.ants = []
@@ -371,7 +728,7 @@ class Colony(Entity):
         number_of_ants = len(self.ants)
         positions = np.zeros((number_of_ants, 2))
         for i, ant in enumerate(self.ants):
-            positions[i] = ant.states["position"]
+            positions[i] = ant.position
         return positions, self.position
 
     def do(self):
@@ -384,11 +741,12 @@ class Colony(Entity):
 
     def update(self):
         # apply all the actions currents made
+        self.realm.profiler.start("colony.update")
         for ant in self.ants:
             lenbefore=len(self.ants)
-            if np.linalg.norm(ant.states["position"] - self.position) > min(self.realm.land.shape)/2 - 60:
+            if self.boundary == "remove" and np.linalg.norm(ant.position - self.position) > min(self.realm.size)/2 - 60:
                 print("an ant was removed because it was near the boundary")
-                print(f"Turning: {ant.turning}, heading: {ant.heading}, other states: {ant.states}")
+                print(f"Turning: {ant.turning}, heading: {ant.heading}, position: {ant.position}, food: {ant.food}")
                 self.ants.remove(ant)
                 assert len(self.ants) != lenbefore
             else:
@@ -401,6 +759,7 @@ class Colony(Entity):
         # update the state variables related to the nest itself
         self.food += self.new_food
         self.new_food = 0
+        self.realm.profiler.stop("colony.update")
 
     def spawn_ant(self):
         # add newborn ants to the list to be added during the next update tick
@@ -1,8 +1,13 @@
 import numpy as np
+import hashlib
+import inspect
+import os
 from scipy.spatial.transform import Rotation as R
-from scipy import stats
 
-sniffmatrix = None
+matrix_cache = {} # (height, width, dtype) -> sniffmatrix
+# where get_sniffmatrix stores its files, CHAOTICANTS_CACHE_DIR overrides the cache/ directory of the repository
+matrix_cache_dir = os.environ.get("CHAOTICANTS_CACHE_DIR",
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'cache'))
 
 """
     Directional reference:
@@ -25,59 +30,69 @@ def detect_straight_line(image):
     gets a 2d numpy array and returns the inclination of the most likely line.
     assumes that there is only one line.
     """
-    a = np.argmax(image, axis=0) #[i, x]
-    b = np.array(np.argmax(image, axis=1)) #[y, i]
-    x_raw = np.concatenate((np.arange(len(a)), b))
-    y_raw = np.concatenate((a, np.arange(len(b))))
-    x = []
-    y = []
-
-    assert len(x_raw) == len(y_raw)
-    edge = len(x_raw)
-
-    for i in range(edge):
-        #remove the first edges, since having no maximum will return the first arg as argmax.
-        xr = x_raw[i]
-        yr = y_raw[i]
-        if xr == 0 or yr == 0:
-            continue
-        x.append(xr)
-        y.append(yr)
-
-    if len(x) > 3:
-        if np.std(x) >= np.std(y):
-            inc = np.polyfit(x, y, deg=1)[0]
-            incj = np.cos(inc) + np.sin(inc)*1j
-        else:
-            inc = np.polyfit(y, x, deg=1)[0]
-            incj = np.sin(inc) + np.cos(inc)*1j 
-
-        return complex_to_exponent(incj)
-    else:
+    inclination = detect_straight_lines(image[np.newaxis])[0]
+    if np.isnan(inclination):
         return None
+    return inclination
+
+def detect_straight_lines(images):
+    """
+    batched version of detect_straight_line.
+    gets a N times h times w stack of images and returns N inclinations, nan where no line was found.
+
+    the maximum of every column and every row gives one point each, points on the first row or column
+    are dropped since an empty row or column also has its argmax there.
+    a line is fitted through the remaining points, along the axis in which they are spread the most.
+    """
+    images = np.asarray(images)
+    n, h, w = images.shape
+    a = np.argmax(images, axis=1) # n times w, row of the maximum in each column
+    b = np.argmax(images, axis=2) # n times h, column of the maximum in each row
+    x = np.concatenate((np.broadcast_to(np.arange(w), (n, w)), b), axis=1).astype(float)
+    y = np.concatenate((a, np.broadcast_to(np.arange(h), (n, h))), axis=1).astype(float)
+    valid = (x != 0) & (y != 0)
+    count = np.count_nonzero(valid, axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.sum(x * valid, axis=1) / count
+        mean_y = np.sum(y * valid, axis=1) / count
+        dx = (x - mean_x[:, None]) * valid
+        dy = (y - mean_y[:, None]) * valid
+        sxx = np.sum(dx * dx, axis=1)
+        syy = np.sum(dy * dy, axis=1)
+        sxy = np.sum(dx * dy, axis=1)
+
+        along_x = sxx >= syy
+        inc = np.where(along_x, sxy / sxx, sxy / syy)
+    inc = np.where(np.isfinite(inc), inc, 0)
+
+    # same as complex_to_exponent(cos(inc) + sin(inc)j) and complex_to_exponent(sin(inc) + cos(inc)j)
+    angle = np.where(along_x, inc, np.pi/2 - inc)
+    inclination = (angle / (2*np.pi)) % 1
+    return np.where(count > 3, inclination, np.nan)
 
 def _build_weight_matrix(height, width):
     center = np.array([height//2, width//2])
     base_weight = 1
     radius = min(height, width)
 
+    ix, iy = np.indices((height, width))
+    dist = np.hypot(center[0] - ix, center[1] - iy)
+    inside = (dist != 0) & (dist <= radius)
     matrix = np.zeros((height, width))
-    for ix, iy in np.ndindex(matrix.shape):
-        dist = np.linalg.norm(center - (ix, iy))
-        if dist == 0 or dist > radius: continue
-        matrix[ix, iy] = round(base_weight / dist,2)
+    matrix[inside] = np.round(base_weight / dist[inside], 2)
 
     return matrix
 
 def _build_direction_matrix(height, width):
     center = np.array([height//2, width//2])
-    
-    matrix = np.zeros((height, width), dtype=np.complex)
-    for ix, iy in np.ndindex(matrix.shape):
-        direction = center - (ix, iy)
-        if direction.any() == 0: continue
-        imag_dir = (-direction[0]*1j - direction[1])/np.linalg.norm(direction)
-        matrix[ix, iy] = imag_dir
+
+    ix, iy = np.indices((height, width))
+    dx = center[0] - ix
+    dy = center[1] - iy
+    norm = np.hypot(dx, dy)
+    norm[norm == 0] = 1 # the center has no direction, and stays zero
+    matrix = (-dx*1j - dy) / norm
 
     return matrix
 
@@ -107,6 +122,7 @@ def logistic(x, x0, L, k):
     x0 = 10
     """
     return L / (1 + np.e**(-k*(x-x0)))
+
 def complex_to_exponent(c):
     dx = c.real
     dy = c.imag
@@ -122,35 +138,138 @@ def direction_to_exponent(array):
     """
     
     if np.linalg.norm(array) == 0: raise ValueError("zero distance has undefined direction")
-    vec = unitvector(array)
-    
-    theta1 = np.arccos(vec[1])
-    theta2 = np.arcsin(vec[0])
-    x_angle_candidates = [theta1, 2*np.pi - theta1]
-    y_angle_candidates = [(theta2 + 2*np.pi)%(2*np.pi), np.pi - theta2]
-
-    for cx in x_angle_candidates:
-        for cy in y_angle_candidates:
-            if np.isclose(cx, cy):
-                return cx / (2*np.pi)
-    
-    raise ValueError("Could not find proper direction")
+    return float(vectors_to_headings(array))
 
-def build_antmath_matrix(height, width):
+def vectors_to_headings(vectors):
     """
-    this function must be run before using any antmath matrix operations.
+    array version of direction_to_exponent. converts a ... times 2 array of x, y vectors into headings.
+    zero vectors get heading 0.
     """
-    
+    vectors = np.asarray(vectors)
+    return (np.arctan2(vectors[..., 0], vectors[..., 1]) / (2*np.pi)) % 1
+
+def complex_to_headings(c):
+    """
+    array version of complex_to_exponent.
+    """
+    c = np.asarray(c)
+    return (np.arctan2(c.imag, c.real) / (2*np.pi)) % 1
+
+class HeadingTable():
+    """
+    precomputed unit vectors for headings quantized to 1/resolution of a turn.
+    """
+    def __init__(self, resolution=4096):
+        self.resolution = resolution
+        angles = 2 * np.pi * np.arange(resolution) / resolution
+        self.vectors = np.stack((np.sin(angles), np.cos(angles)), axis=-1)
+
+    def lookup(self, headings):
+        index = np.rint(np.asarray(headings) * self.resolution).astype(np.intp) % self.resolution
+        return self.vectors[index]
+
+def headings_to_vectors(headings, table=None):
+    """
+    converts headings into a ... times 2 array of unit vectors, the same as imag_to_array(np.e ** (2j*np.pi*heading)).
+    if a HeadingTable is given, the headings are quantized and looked up instead of computed.
+    """
+    if table is not None:
+        return table.lookup(headings)
+    angle = 2 * np.pi * np.asarray(headings)
+    return np.stack((np.sin(angle), np.cos(angle)), axis=-1)
+
+def _build_sniffmatrix(height, width, dtype):
     w = _build_weight_matrix(height, width)
     d = _build_direction_matrix(height, width)
-    f = np.multiply(w, d)
-    global sniffmatrix
-    sniffmatrix = f
+    return np.multiply(w, d).astype(dtype)
+
+_builder_hash = None
+def _sniffmatrix_builder_hash():
+    """
+    a short hash of the source of the functions that build the sniffmatrix. it is part of the name of the
+    cached files, so that a change to the builders does not load matrices built by the old ones.
+    """
+    global _builder_hash
+    if _builder_hash is None:
+        source = "".join(inspect.getsource(f)
+            for f in (_build_sniffmatrix, _build_weight_matrix, _build_direction_matrix))
+        _builder_hash = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return _builder_hash
+
+def _matrix_cache_path(cache_dir, height, width, dtype):
+    return os.path.join(cache_dir,
+        f"sniffmatrix_{height}x{width}_{np.dtype(dtype).name}_{_sniffmatrix_builder_hash()}.npy")
+
+def get_sniffmatrix(height, width, dtype=np.complex128, use_disk=True, cache_dir=None):
+    """
+    returns the sniffmatrix of the given size, building it only once.
+    matrices are memoized in matrix_cache, and stored as .npy files in cache_dir (matrix_cache_dir by default)
+    so that other processes and later runs can load them instead of building them again.
+    the file names contain a hash of the builders, files of other versions are ignored.
+    the files are only an optimization: when the directory can't be read or written, the matrix is built
+    and kept in memory.
+    """
+    key = (height, width, np.dtype(dtype).name)
+    if key in matrix_cache:
+        return matrix_cache[key]
+
+    cache_dir = matrix_cache_dir if cache_dir is None else cache_dir
+    path = _matrix_cache_path(cache_dir, height, width, dtype)
+    f = None
+    if use_disk:
+        try:
+            f = np.load(path)
+        except (OSError, ValueError, EOFError): # missing, unreadable or damaged
+            f = None
+    if f is None:
+        f = _build_sniffmatrix(height, width, dtype)
+        if use_disk:
+            _save_sniffmatrix(cache_dir, path, f)
+
+    f.setflags(write=False)
+    matrix_cache[key] = f
     return f
 
-antmath_random = None
-antmath_bins = None
+def _save_sniffmatrix(cache_dir, path, f):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp, "wb") as fp:
+            np.save(fp, f)
+        os.replace(tmp, path) # other processes never see a partially written file
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+class Context():
+    """
+    the antmath tables used by one colony, passed around explicitly instead of through module globals,
+    so that several simulations can run in the same process.
+    sniffmatrix: the matrix used by sniff, see get_sniffmatrix
+    heading_table: optional HeadingTable, which makes the ants walk in quantized directions
+    sniff_columns: the sniffmatrix flattened into a real (height*width) times 2 matrix of its real and
+        imaginary parts, so that the sniff vectors of a stack of flattened windows are one matrix product
+    """
+    def __init__(self, height, width, dtype=np.complex128, heading_table=None):
+        self.sniffmatrix = get_sniffmatrix(height, width, dtype)
+        self.sniff_columns = np.stack((self.sniffmatrix.real.ravel(), self.sniffmatrix.imag.ravel()), axis=1)
+        self.heading_table = heading_table
+
+def complex_dtype(dtype):
+    """
+    the complex type with the same precision as the given float type, i.e. float32 -> complex64.
+    """
+    return np.result_type(dtype, np.complex64)
+
+antmath_bins = 1000
+antmath_cdf = None
 def __prepare_random():
+    """
+    builds the cumulative histogram of the logistic map, iterated from evenly spaced starting points.
+    only needed by random_histogram(), random() uses the closed form instead.
+    """
     def logistic(x):
         return 4*x*(1-x)
 
@@ -161,21 +280,42 @@ def __prepare_random():
     for i in range(samples-1):
         data[i+1] = logistic(data[i])
 
-    global antmath_bins
-    h, b = np.histogram(data.reshape((samples**2,1)), bins=1000)
-    pk = tuple(h/np.sum(h))
-    xk = range(len(pk))
+    h, b = np.histogram(data.reshape((samples**2,1)), bins=antmath_bins)
+    global antmath_cdf
+    antmath_cdf = np.cumsum(h/np.sum(h))
+    antmath_cdf[-1] = 1
 
-    global antmath_random
-    antmath_bins = len(pk)
-    antmath_random = stats.rv_discrete(name="custm", values=(xk, pk))
-    
-def random():
-    if not antmath_random:
+def random_histogram(size=None, rng=None):
+    """
+    samples bins of the measured logistic map histogram by inverting its cumulative distribution.
+    """
+    if antmath_cdf is None:
         __prepare_random()
-    
-    res = antmath_random.rvs(size=1)
-    return res[0]/antmath_bins
+
+    u = _uniform(rng, 1 if size is None else size)
+    res = np.searchsorted(antmath_cdf, u, side="right") / antmath_bins
+    return res[0] if size is None else res
+
+def _uniform(rng, size):
+    if rng is None:
+        return np.random.rand(size)
+    return rng.random(size)
+
+def random(size=None, rng=None):
+    """
+    returns a sample from the logistic map distribution.
+    if size is given, an array of that many samples is returned instead.
+    rng is the np.random.Generator to draw from, the global numpy random state is used if it is not given.
+
+    the invariant density of the logistic map with r=4 is 1/(pi*sqrt(x(1-x))),
+    which has the cumulative distribution 2/pi*arcsin(sqrt(x)).
+    inverting it gives x = sin(pi*u/2)^2 for uniform u, so no warmup or lookup is needed.
+    the result is rounded down to the same 1/antmath_bins steps as the histogram.
+    """
+    u = _uniform(rng, 1 if size is None else size)
+    x = np.sin(np.pi * u / 2)**2
+    res = np.minimum(np.floor(x * antmath_bins), antmath_bins - 1) / antmath_bins
+    return res[0] if size is None else res
 
 if __name__ == "__main__":
     testlist = []
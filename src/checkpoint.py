@@ -0,0 +1,231 @@
+# saving, restoring and forking running simulations.
+import json
+import os
+import numpy as np
+import antmath
+from ant import Realm, Colony, Ant, AntModes
+from swarm import SwarmColony
+
+"""
+    A checkpoint is a directory with three files:
+    land.npy        the pheromone land, which can be memory mapped when it is loaded
+    arrays.npz      food, ant states and pending deposits as arrays
+    state.json      settings, times and the states of all random generators
+
+    Checkpoints should be taken between ticks, that is after progress_time returned.
+"""
+
+COLONY_CLASSES = {"Colony": Colony, "SwarmColony": SwarmColony}
+
+def _python_ints(value):
+    """
+    numpy integers, and lists of them, as python ints, which json can write.
+    seeds are numpy integers when they come from a numpy array, as in main.py.
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [int(v) for v in value]
+    return int(value)
+
+def _seed_sequence_state(ss):
+    return {
+        "entropy": _python_ints(ss.entropy),
+        "spawn_key": _python_ints(ss.spawn_key),
+        "n_children_spawned": ss.n_children_spawned,
+    }
+
+def _restore_seed_sequence(state):
+    return np.random.SeedSequence(state["entropy"], spawn_key=state["spawn_key"],
+        n_children_spawned=state["n_children_spawned"])
+
+def _restore_rng(state):
+    rng = np.random.default_rng()
+    rng.bit_generator.state = state
+    return rng
+
+def _ant_arrays(colony):
+    """
+    returns the states of the ants of a colony as arrays, for both colony types.
+    """
+    if isinstance(colony, SwarmColony):
+        return {
+            "position": colony.ant_position, "heading": colony.ant_heading,
+            "turning": colony.ant_turning, "mode": colony.ant_mode,
+            "food": colony.ant_food, "birth_time": colony.ant_birth_time,
+        }
+    ants = colony.ants
+    return {
+        "position": np.array([ant.position for ant in ants], dtype=float).reshape(-1, 2),
+        "heading": np.array([ant.heading for ant in ants], dtype=float),
+        "turning": np.array([ant.turning for ant in ants], dtype=float),
+        "mode": np.array([ant.mode.value for ant in ants], dtype=np.int8),
+        "food": np.array([ant.food for ant in ants], dtype=float),
+        "birth_time": np.array([ant.birth_time for ant in ants], dtype=float),
+    }
+
+def _set_ant_arrays(colony, arrays):
+    n = len(arrays["heading"])
+    if isinstance(colony, SwarmColony):
+        colony._allocate(n)
+        colony.ant_position[:] = arrays["position"]
+        colony.ant_heading[:] = arrays["heading"]
+        colony.ant_turning[:] = arrays["turning"]
+        colony.ant_mode[:] = arrays["mode"]
+        colony.ant_food[:] = arrays["food"]
+        colony.ant_birth_time[:] = arrays["birth_time"]
+        colony.next_position[:] = colony.ant_position
+        colony.next_food[:] = colony.ant_food
+        return
+
+    colony.ants = []
+    for i in range(n):
+        ant = Ant(colony, colony.chaotic_constant) # draws from colony.rng, which is restored afterwards
+        ant.position = np.array(arrays["position"][i])
+        ant.food = arrays["food"][i].item()
+        ant.heading = arrays["heading"][i].item()
+        ant.turning = arrays["turning"][i].item()
+        ant.mode = AntModes(int(arrays["mode"][i]))
+        ant.birth_time = arrays["birth_time"][i].item()
+        colony.ants.append(ant)
+
+def save_checkpoint(path, realm, colonies):
+    """
+    writes the realm and its colonies into the directory path.
+    """
+    os.makedirs(path, exist_ok=True)
+    stack = realm.stack if realm.stack is not None else np.stack([np.asarray(land) for land in realm.lands])
+    np.save(os.path.join(path, "land.npy"), stack)
+
+    arrays = {
+        "food_position": np.array([f.position for f in realm.food_list], dtype=float).reshape(-1, 2),
+        "food_amount": np.array([f.amount for f in realm.food_list], dtype=float),
+        "deposit_position": realm.deposits.positions[:len(realm.deposits)],
+        "deposit_amount": realm.deposits.amounts[:len(realm.deposits)],
+        "deposit_channel": realm.deposits.channels[:len(realm.deposits)],
+    }
+    for k, (field, _) in enumerate(realm.sniff_fields.values()):
+        arrays[f"sniff_field_{k}"] = field
+
+    state = {
+        "realm": {
+            "size": list(realm.size),
+            "time": realm.time,
+            "evaporation": realm.evaporate_rate,
+            "lazy_decay": realm.lazy_decay,
+            "dtype": realm.dtype.name,
+            "tile_size": realm.tile_size,
+            "halo": realm.halo,
+            "land_scale": realm.land_scale,
+            "sniff_field_interval": realm.sniff_field_interval,
+            "sniff_fields": [[list(shape), dtype, built]
+                for (shape, dtype), (_, built) in realm.sniff_fields.items()],
+            "seed_sequence": _seed_sequence_state(realm.seed_sequence),
+            "rng": realm.rng.bit_generator.state,
+        },
+        "colonies": [],
+    }
+
+    for c, colony in enumerate(colonies):
+        table = colony.context.heading_table
+        state["colonies"].append({
+            "class": type(colony).__name__,
+            "position": [float(v) for v in colony.position],
+            "range": colony.range,
+            "noise": colony.noise,
+            "chaotic_constant": colony.chaotic_constant,
+            "sniff_radius": colony.sniff_radius,
+            "food_radius": colony.food_radius,
+            "channel": colony.channel,
+            "boundary": colony.boundary,
+            "food": np.asarray(colony.food).item(), # an int, or a float if food amounts were fractional
+            "new_food": np.asarray(colony.new_food).item(),
+            "sniff_dtype": colony.context.sniffmatrix.dtype.name,
+            "heading_table": table.resolution if table is not None else None,
+            "rng": colony.rng.bit_generator.state,
+        })
+        for key, value in _ant_arrays(colony).items():
+            arrays[f"colony_{c}_{key}"] = value
+
+    np.savez_compressed(os.path.join(path, "arrays.npz"), **arrays)
+    with open(os.path.join(path, "state.json"), "w") as f:
+        json.dump(state, f)
+
+def load_checkpoint(path, mmap=True):
+    """
+    restores a live realm and its colonies from the directory path.
+    with mmap, a dense land is memory mapped copy-on-write, so restoring is cheap and
+    several simulations loaded from the same checkpoint share the unchanged pages.
+    a tiled land is rebuilt from the saved dense array.
+    returns the realm and the list of colonies.
+    """
+    with open(os.path.join(path, "state.json")) as f:
+        state = json.load(f)
+    arrays = np.load(os.path.join(path, "arrays.npz"))
+
+    s = state["realm"]
+    realm = Realm(size=tuple(s["size"]), evaporation=s["evaporation"], lazy_decay=s["lazy_decay"],
+        sniff_field_interval=s["sniff_field_interval"], tile_size=s["tile_size"], dtype=s["dtype"],
+        halo=s["halo"])
+    land = np.load(os.path.join(path, "land.npy"), mmap_mode="c" if mmap else None)
+    realm.set_lands(land)
+    realm.time = s["time"]
+    realm.land_scale = s["land_scale"]
+    realm.seed_sequence = _restore_seed_sequence(s["seed_sequence"])
+    realm.rng = _restore_rng(s["rng"])
+    for position, amount in zip(arrays["food_position"], arrays["food_amount"]):
+        realm.spawn_food(position, amount.item())
+    realm.deposits.put_many(arrays["deposit_position"], arrays["deposit_amount"], arrays["deposit_channel"])
+    for k, (shape, dtype, built) in enumerate(s["sniff_fields"]):
+        field = arrays[f"sniff_field_{k}"]
+        realm.sniff_fields[(tuple(shape), dtype)] = (field, built)
+
+    colonies = []
+    for c, cs in enumerate(state["colonies"]):
+        table = antmath.HeadingTable(cs["heading_table"]) if cs["heading_table"] else None
+        context = antmath.Context(cs["sniff_radius"]*2, cs["sniff_radius"]*2,
+            dtype=cs["sniff_dtype"], heading_table=table)
+        colony = COLONY_CLASSES[cs["class"]](realm=realm, nest_position=cs["position"],
+            sniff_radius=cs["sniff_radius"], food_radius=cs["food_radius"],
+            starting_food=cs["food"], noise=cs["noise"], chaotic_constant=cs["chaotic_constant"],
+            context=context, rng=_restore_rng(cs["rng"]), boundary=cs["boundary"])
+        colony.channel = cs["channel"]
+        colony.range = cs["range"]
+        colony.new_food = cs["new_food"]
+        ant_arrays = {key: arrays[f"colony_{c}_{key}"]
+            for key in ("position", "heading", "turning", "mode", "food", "birth_time")}
+        _set_ant_arrays(colony, ant_arrays)
+        colony.rng.bit_generator.state = cs["rng"]
+        colonies.append(colony)
+
+    return realm, colonies
+
+def fork_checkpoint(path, variations, mmap=True):
+    """
+    restores one simulation per dictionary in variations, and changes its parameters.
+    supported keys:
+    seed: gives the child new random streams derived from this seed
+    evaporation, lazy_decay, sniff_field_interval: realm settings
+    noise: noise of every colony
+    returns a list of (realm, colonies) pairs.
+    """
+    children = []
+    for variation in variations:
+        realm, colonies = load_checkpoint(path, mmap=mmap)
+        if "seed" in variation:
+            realm.seed_sequence = np.random.SeedSequence(variation["seed"])
+            realm.rng = realm.spawn_rng()
+            for colony in colonies:
+                colony.rng = realm.spawn_rng()
+                for ant in colony.ants:
+                    ant.rng = colony.rng
+        if "evaporation" in variation:
+            realm.evaporate_rate = variation["evaporation"]
+        if "lazy_decay" in variation:
+            realm.renormalize()
+            realm.lazy_decay = variation["lazy_decay"]
+        if "sniff_field_interval" in variation:
+            realm.sniff_field_interval = variation["sniff_field_interval"]
+        if "noise" in variation:
+            for colony in colonies:
+                colony.noise = variation["noise"]
+        children.append((realm, colonies))
+    return children
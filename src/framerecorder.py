@@ -0,0 +1,118 @@
+# records frames of a simulation to disk without a display.
+import os
+import queue
+import threading
+import numpy as np
+from swarm import SwarmColony
+
+ASSETS_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'assets')
+
+class FrameRecorder():
+    def __init__(self, realm, colonies, path, every=10, size=(512, 512), middle=None, zoomlevel=None,
+        max_frames=1000, threaded=True, queue_size=8, headless=True):
+        """
+        draws the realm with the pygame visualizer every `every` ticks, and writes the frames to path.
+        if path ends with .npy, the frames are written into one memory mapped uint8 array
+        of max_frames times height times width times 3, and frames beyond max_frames are dropped.
+        otherwise path is a directory that gets a png file per frame, named by the tick.
+
+        middle and zoomlevel set the camera, by default it shows the whole realm.
+        with threaded, the files are written by a background thread. at most queue_size frames
+        wait for it, so record() blocks instead of letting the memory grow when the disk is slow.
+        headless uses the dummy video driver of SDL, so no display is needed.
+        """
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        import pygame as pg
+        from pygamevisualizer import PygameVisualizer
+        self.pg = pg
+        self.realm = realm
+        self.colonies = colonies
+        self.path = path
+        self.every = every
+        self.size = tuple(size)
+        self.frames = 0
+
+        self.ants = []
+        self.ants_with_food = []
+        sprites = [os.path.join(ASSETS_PATH, name) for name in ("food.png", "home.png", "ant.png", "ant_with_food.png")]
+        self.visualizer = PygameVisualizer(
+            list(zip([realm.food_list, colonies, self.ants, self.ants_with_food], sprites)),
+            tickrate=0, screensize=self.size)
+        camera = self.visualizer.camera
+        shape = np.array(realm.size)
+        camera.middle = np.array(middle if middle is not None else shape / 2, dtype=float)
+        camera.zoomlevel = zoomlevel if zoomlevel is not None else max(shape[0], shape[1] * camera.aspect)
+
+        if path.endswith(".npy"):
+            self.movie = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8,
+                shape=(max_frames, self.size[1], self.size[0], 3))
+        else:
+            self.movie = None
+            os.makedirs(path, exist_ok=True)
+
+        self.queue = None
+        if threaded:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+
+    def _update_ants(self):
+        self.ants[:] = []
+        self.ants_with_food[:] = []
+        for colony in self.colonies:
+            if isinstance(colony, SwarmColony):
+                self.ants += colony.get_ant_views(carrying=False)
+                self.ants_with_food += colony.get_ant_views(carrying=True)
+            else:
+                self.ants += [ant for ant in colony.ants if ant.food == 0]
+                self.ants_with_food += [ant for ant in colony.ants if ant.food != 0]
+
+    def record(self):
+        """
+        called after every tick, draws and writes a frame when the time is a multiple of every.
+        returns whether a frame was recorded.
+        """
+        if self.realm.time % self.every != 0:
+            return False
+        if self.movie is not None and self.frames >= len(self.movie):
+            return False
+        self.realm.profiler.start("record")
+        self._update_ants()
+        self.visualizer.draw_frame(self.realm)
+        if self.movie is not None:
+            frame = (self.frames, self.pg.surfarray.array3d(self.visualizer.screen).transpose(1, 0, 2))
+        else:
+            frame = (self.realm.time, self.visualizer.screen.copy())
+        if self.queue is not None:
+            self.queue.put(frame)
+        else:
+            self._write(*frame)
+        self.frames += 1
+        self.realm.profiler.stop("record")
+        return True
+
+    def _write(self, index, frame):
+        if self.movie is not None:
+            self.movie[index] = frame
+        else:
+            self.pg.image.save(frame, os.path.join(self.path, f"frame_{index:08d}.png"))
+
+    def _write_loop(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            self._write(*frame)
+
+    def close(self):
+        """
+        waits for the writer to finish, and flushes the memory mapped file.
+        returns the number of recorded frames.
+        """
+        if self.queue is not None:
+            self.queue.put(None)
+            self.writer.join()
+        if self.movie is not None:
+            self.movie.flush()
+        return self.frames
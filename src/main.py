@@ -1,110 +1,61 @@
 # the main program that runs and animates the and behaviour
-from ant import Realm, Ant, Colony
+from swarm import SwarmColony
+from simulation import setup_simulation, progress_time
 from pygamevisualizer import PygameVisualizer
+from snapshot import start_renderer
 import sys
 import numpy as np
-import antmath
 import os
 
 ASSETS_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'assets')
 
-def spawn_random_food(realm, count, total_amount=None):
-    if total_amount:
-        amounts = np.random.multinomial(total_amount, [1/count]*count)
-        for a in amounts:
-            dist = np.random.rand(1) * 100
-            angle = np.random.rand() * np.pi * 2
-            position = np.array([500, 500]) + [np.cos(angle), np.sin(angle)] * dist
-            realm.spawn_food(position, a)
-    else:
-        for _ in range(count):
-            position = np.array(realm.land.shape) * np.random.rand(2)
-            amount = int(np.random.rand() * 50 + 50)
-            realm.spawn_food(position, amount)
-
-def spawn_predefined_food(realm, center, pattern):
-    food_patterns = {
-        "equal-cross": [
-            [center+(0,100), 500],
-            [center+(0,-100), 500],
-            [center+(100,0), 500],
-            [center+(-100,0), 500]
-        ],
-        "skewed-cross": [
-            [center+(0,100), 100],
-            [center+(0,-100), 1000],
-            [center+(100,0), 200],
-            [center+(-100,0), 200]
-        ],
-        "quick-test": [
-            [center+(0,70), 20],
-            [center+(0,-70), 20],
-            [center+(70,0), 20],
-            [center+(-70,0), 20]
-        ],
-    }
-    if pattern in food_patterns:
-        for position, amount in food_patterns[pattern]:
-            realm.spawn_food(position, amount)
-    else:
-        raise ValueError("Undefined pattern")
-    
-def progress_time(realm, colonies):
-    for colony in colonies:
-        for ant in colony.ants:
-            ant.do()
-                   
-        colony.do()
-        colony.update()
-    realm.update()
-
 def main(stepping = False):
     # static settings
     realm_size = (1000, 1000)
     nest_position = (500, 500)
+    nest_positions = None # a list of positions places a competing colony at each, with its own pheromone channel
+    boundary = "remove" # "bounce" keeps ants near the edge on the map instead of removing them, for nests off the center
     
     # experiment settings
     use_visualiser = True
+    render_in_background = False # draw in another process from snapshots, skipping the ticks it cannot keep up with
     number_of_simulations = 1
     seed_list = np.linspace(1, number_of_simulations, number_of_simulations, dtype=int)
 
     # simulation settings
     evaporation = 0.99
+    lazy_decay = True # evaporate by a global scale factor instead of rewriting the land every tick
+    sniff_field_interval = 0 # if positive, ants sniff from a whole-map field rebuilt every this many ticks
+    tile_size = None # if set, the land is stored sparsely in tiles of this size
+    precision = "float64" # "float32" stores the land as float32 and the sniffmatrix as complex64
     sniff_radius = 50
     food_radius = 30
     starting_ants = 30
     noise_ratio = 0.5
     pattern_name = "equal-cross"
+    batched = False # use SwarmColony, which steps all ants with array operations
     # end of settings section.
     
     results = []
     for i in range(number_of_simulations):
-        # seed the simulation
-        np.random.seed(seed_list[i])
-
-        # setup the colony
-        realm = Realm(size=realm_size, evaporation=evaporation)
-        antmath.build_antmath_matrix(sniff_radius*2, sniff_radius*2)
-        colony = Colony(realm=realm, nest_position=nest_position,
-            starting_ants=starting_ants, chaotic_constant=4, noise=noise_ratio,
-            sniff_radius=sniff_radius, food_radius=food_radius)
-        colonies = [colony] # there is only one colony for now.
-        
-        # setup the food
-        if pattern_name == "random":
-            spawn_random_food(realm, count=10, total_amount=2000)
-        else: spawn_predefined_food(realm, center=colony.position, pattern=pattern_name)
+        # setup the colony and the food, seeded with the seed of this simulation
+        realm, colonies = setup_simulation(seed=seed_list[i], realm_size=realm_size, nest_position=nest_position,
+            evaporation=evaporation, lazy_decay=lazy_decay, sniff_field_interval=sniff_field_interval,
+            sniff_radius=sniff_radius, food_radius=food_radius, starting_ants=starting_ants,
+            noise=noise_ratio, pattern=pattern_name, batched=batched, tile_size=tile_size,
+            precision=precision, nest_positions=nest_positions, boundary=boundary)
+        colony = colonies[0] # the camera starts at the first colony
 
         # running pygamevisualizer
-        if use_visualiser:
+        sprites = [os.path.join(ASSETS_PATH, name) for name in ("food.png", "home.png", "ant.png", "ant_with_food.png")]
+        if use_visualiser and render_in_background:
+            publisher, renderer = start_renderer(realm, sprites, tuple(colony.position))
+        elif use_visualiser:
             ants = []
             ants_with_food = []
 
             pgv = PygameVisualizer(
-                [(realm.food_list, os.path.join(ASSETS_PATH, "food.png"))]
-                + [(colonies, os.path.join(ASSETS_PATH, "home.png"))]
-                + [(ants, os.path.join(ASSETS_PATH, "ant.png"))]
-                + [(ants_with_food, os.path.join(ASSETS_PATH, "ant_with_food.png"))],
+                list(zip([realm.food_list, colonies, ants, ants_with_food], sprites)),
                 tickrate=0 #zero means that there is no framerate cap
                 )
             pgv.camera.middle = tuple(colony.position)
@@ -112,13 +63,19 @@ def main(stepping = False):
         # simulation main loop
         while True:
             progress_time(realm, colonies)
-            if use_visualiser:
+            if use_visualiser and render_in_background:
+                publisher.publish(realm, colonies)
+            elif use_visualiser:
                 pgv.step_frame(realm)
                 ants[:] = []
                 ants_with_food[:] = []
                 for colony in colonies:
-                    a = [ant for ant in colony.ants if ant.states["food"] == 0]
-                    af = [ant for ant in colony.ants if ant.states["food"] != 0]
+                    if isinstance(colony, SwarmColony):
+                        ants += colony.get_ant_views(carrying=False)
+                        ants_with_food += colony.get_ant_views(carrying=True)
+                        continue
+                    a = [ant for ant in colony.ants if ant.food == 0]
+                    af = [ant for ant in colony.ants if ant.food != 0]
                     ants += a
                     ants_with_food += af
                 if stepping:
@@ -129,6 +86,9 @@ def main(stepping = False):
                 num_ticks = realm.time
                 print(f"{i}/{number_of_simulations}, simulation ended after {num_ticks} ticks.")
                 results.append(num_ticks)
+                if use_visualiser and render_in_background:
+                    publisher.close()
+                    renderer.join()
                 break
 
     # simulation report
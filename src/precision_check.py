@@ -0,0 +1,49 @@
+# compares the completion ticks of float32 runs against float64 runs with the same seeds.
+# example: python precision_check.py --noise 0.5 --patterns equal-cross --runs 20
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sweep import make_jobs, _run
+
+def compare(noises, patterns, ant_counts, seeds, settings, workers=None):
+    """
+    runs every configuration in both precisions, and returns a dict of
+    (noise, pattern, ants) -> (float64 ticks, float32 ticks), ordered by seed.
+    """
+    jobs = []
+    for precision in ("float64", "float32"):
+        jobs += make_jobs(noises, patterns, ant_counts, seeds, dict(settings, precision=precision))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run, jobs))
+
+    ticks = {}
+    for (noise, pattern, ants, seed, job_settings), result in zip(jobs, results):
+        key = (noise, pattern, ants)
+        ticks.setdefault(key, {"float64": [], "float32": []})
+        ticks[key][job_settings["precision"]].append(result["ticks"])
+    return {key: (np.array(t["float64"]), np.array(t["float32"])) for key, t in ticks.items()}
+
+def report(comparison):
+    for (noise, pattern, ants), (t64, t32) in comparison.items():
+        diff = t32 - t64
+        print(f"noise: {noise}, pattern: {pattern}, ants: {ants}, runs: {len(t64)}")
+        print(f"    float64 mean: {np.mean(t64):.1f}, std: {np.std(t64):.1f}, median: {np.median(t64)}")
+        print(f"    float32 mean: {np.mean(t32):.1f}, std: {np.std(t32):.1f}, median: {np.median(t32)}")
+        print(f"    shift of the mean: {np.mean(diff):+.1f} ticks ({np.mean(diff)/np.mean(t64):+.2%}), "
+            f"identical runs: {np.count_nonzero(diff == 0)}/{len(diff)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare completion ticks of float32 and float64 runs.")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--patterns", nargs="+", default=["equal-cross"])
+    parser.add_argument("--ants", type=int, nargs="+", default=[30])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batched", action="store_true")
+    args = parser.parse_args(argv)
+
+    seeds = range(1, args.runs + 1)
+    report(compare(args.noise, args.patterns, args.ants, seeds, {"batched": args.batched}, args.workers))
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import numpy as np
 import random
 import sys
 import pdb
+from collections import OrderedDict
 
 BLACK = (0,0,0)
 
@@ -149,6 +150,35 @@ class Profiler:
             print(f"Profiling: {subject} took {time} ms which is {(time/slowest):.2%} as slow as the slowest")
         print()
 
+class SpriteCache:
+    """
+    least recently used cache of scaled and rotated sprites.
+    angles are quantized to angle_step degrees, and the whole cache is dropped when the zoom changes.
+    """
+    def __init__(self, angle_step = 3, max_size = 2048):
+        self.angle_step = angle_step
+        self.max_size = max_size
+        self.zoom = None
+        self.surfaces = OrderedDict()
+
+    def get(self, sprite_name, sprite, zoom, angle):
+        if zoom != self.zoom:
+            self.surfaces.clear()
+            self.zoom = zoom
+        steps = int(round(360 / self.angle_step))
+        quantized = int(round(angle / self.angle_step)) % steps
+        key = (sprite_name, quantized)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            scaled = pg.transform.scale(sprite, zoom)
+            surface = pg.transform.rotate(scaled, quantized * self.angle_step)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
 class PygameVisualizer:
     def __init__(self, targets, tickrate = 40, screensize = (1024, 800)):
         """ 
@@ -170,6 +200,16 @@ class PygameVisualizer:
         self.world_bounds = None
         self.debug_legend_data = {}
         self.debug_vector_scaling = 1000
+        self.sprite_cache = SpriteCache()
+        self.fonts = {}
+        self.text_cache = {}
+        self.key_callbacks = {} # key -> function called when the key is pressed
+        self.phero_lut_max = 60 # pheromone amount of the last colour, the sigmoid is above 0.995 there
+        self.phero_key = None # realm, time, bounds and screen size of the last coloured land
+        self.phero_surface = None
+        self.phero_background = None
+        self.phero_scratch = None
+        self.__build_pheromone_lut()
         self.__construct_pheromone_legend()
         
 
@@ -179,6 +219,11 @@ class PygameVisualizer:
             (177 * (1-strength) +   0*strength).astype(np.uint8),
             (76  * (1-strength) + 255*strength).astype(np.uint8)))
 
+    def __build_pheromone_lut(self):
+        amounts = np.arange(256) * self.phero_lut_max / 255
+        strength = 2 / (1 + np.e**(-0.1*amounts)) - 1
+        self.phero_lut = self.__get_phero_color(strength).T
+
     def __construct_pheromone_legend(self, frame_w = 4, frame_h = 4):
         start_arr = np.array([np.linspace(0, 1, 255)])
         arr = np.empty((*start_arr.shape,3), dtype=np.uint8)
@@ -195,17 +240,33 @@ class PygameVisualizer:
         self.screen.blit(self.phero_legend, pos)
 
     def __draw_pheromones(self, realm):
-        def scale_color(image):
-            w, h = image.shape
-            ret = np.empty((w,h,3), dtype=np.uint8)
-            strength = 2 / (1 + np.e**(-0.1*array)) - 1
-            ret[:,:,0], ret[:,:,1], ret[:,:,2] = self.__get_phero_color(strength)
-            return ret
-
+        """
+        the visible land is quantized to the 256 colours of the lookup table, written into a persistent
+        8 bit surface whose palette is the table, and scaled to the screen.
+        nothing is recomputed while the realm time and the camera stay the same.
+        """
         xleft, xright, ytop, ybottom = map(int, self.world_bounds)
-        array = realm.land[xleft+1:xright-1,ytop+1:ybottom-1]
-        surf = pg.surfarray.make_surface(scale_color(array))
-        pg.transform.scale(surf, self.screen.get_size(), self.screen)
+        key = (id(realm), realm.time, xleft, xright, ytop, ybottom, self.screen.get_size())
+        if key != self.phero_key:
+            array = realm.get_slice(xleft+1, xright-1, ytop+1, ybottom-1)
+            if array.size == 0:
+                self.screen.fill(BLACK)
+                return
+            if self.phero_surface is None or self.phero_surface.get_size() != array.shape:
+                self.phero_surface = pg.Surface(array.shape, depth=8)
+                self.phero_surface.set_palette([tuple(c) for c in self.phero_lut])
+                self.phero_scratch = np.empty(array.shape, dtype=np.float32)
+            if self.phero_background is None or self.phero_background.get_size() != self.screen.get_size():
+                self.phero_background = pg.Surface(self.screen.get_size(), depth=8)
+                self.phero_background.set_palette([tuple(c) for c in self.phero_lut])
+            np.multiply(array, 255 / self.phero_lut_max, out=self.phero_scratch, casting="unsafe")
+            np.clip(self.phero_scratch, 0, 255, out=self.phero_scratch)
+            pixels = pg.surfarray.pixels2d(self.phero_surface)
+            pixels[...] = self.phero_scratch
+            del pixels # unlocks the surface
+            pg.transform.scale(self.phero_surface, self.screen.get_size(), self.phero_background)
+            self.phero_key = key
+        self.screen.blit(self.phero_background, (0, 0))
 
     def __is_on_screen(self, pos):
         xleft, xright, ytop, ybottom = self.world_bounds
@@ -224,12 +285,19 @@ class PygameVisualizer:
             return
         next_pos = (10, 10)
         for dd in self.debug_legend_data:
-            font = pg.font.SysFont(fontname, fontsize)
             color = self.debug_legend_data[dd]["color"]
-            text = font.render(dd, True, color)
+            text = self.__render_text(dd, color, fontname, fontsize)
             self.screen.blit(text, next_pos)
             next_pos = (next_pos[0], next_pos[1] + text.get_height())
         
+    def __render_text(self, text, color, fontname, fontsize):
+        key = (text, tuple(color), fontname, fontsize)
+        if key not in self.text_cache:
+            if (fontname, fontsize) not in self.fonts:
+                self.fonts[(fontname, fontsize)] = pg.font.SysFont(fontname, fontsize)
+            self.text_cache[key] = self.fonts[(fontname, fontsize)].render(text, True, color)
+        return self.text_cache[key]
+
     def __draw_debug(self, ent, pos):
         if not self.debug_mode:
             return
@@ -251,9 +319,12 @@ class PygameVisualizer:
             self.profiler.start_profiling("pheromones")
             self.__draw_pheromones(realm)
             self.profiler.end_profiling("pheromones")
+        else:
+            self.screen.fill(self.phero_lut[0])
             
 
         self.profiler.start_profiling("entities")
+        zoom = self.camera.get_zoom()
         for entities, sprite_name in self.targets:
             if sprite_name not in self.sprites:
                 self.sprites[sprite_name] = pg.image.load(sprite_name).convert_alpha()
@@ -262,11 +333,11 @@ class PygameVisualizer:
                 x, y = ent.get_position()
                 if self.__is_on_screen((x, y)):
                     pos = self.camera.world_to_screen_coordinate((x, y))
-                    scaled = pg.transform.scale(sprite, self.camera.get_zoom())
-                    rotated = pg.transform.rotate(scaled, ((270 + ent.get_heading()*360) % 360))
+                    angle = (270 + ent.get_heading()*360) % 360
+                    rotated = self.sprite_cache.get(sprite_name, sprite, zoom, angle)
                     self.screen.blit(rotated, pos)
                     if self.debug_mode:
-                        spritesize = scaled.get_size()
+                        spritesize = zoom # the size of the scaled sprite before rotation
                         pos_middle = (pos[0] + spritesize[0]/2, pos[1] + spritesize[1]/2)
                         self.__draw_debug(ent, pos_middle)
                             
@@ -288,6 +359,8 @@ class PygameVisualizer:
                 self.debug_mode = event.type == pg.KEYDOWN
             elif (event.type == pg.KEYDOWN or event.type == pg.KEYUP) and event.key == pg.K_x:
                 self.profiler.enabled = event.type == pg.KEYDOWN
+            elif event.type == pg.KEYDOWN and event.key in self.key_callbacks:
+                self.key_callbacks[event.key]()
             else:
                 self.camera.handle_event(event)
 
@@ -297,6 +370,13 @@ class PygameVisualizer:
         self.__draw(realm)
         self.camera.tick(delta)
 
+    def draw_frame(self, realm=None):
+        """
+        draws one frame without handling events or waiting for the frame rate, used to record frames.
+        """
+        self.world_bounds = self.camera.get_world_coordinate_bounds()
+        self.__draw(realm)
+
     def step_frame(self, realm=None):
         self.tick(self.delta, realm)
         self.delta = self.clock.tick(self.tickrate)
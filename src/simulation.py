@@ -0,0 +1,143 @@
+# the simulation core, without any visualisation. used by main.py and sweep.py
+from ant import Realm, Colony
+from swarm import SwarmColony
+import numpy as np
+import antmath
+from tickprofiler import TickProfiler
+import time
+
+def spawn_random_food(realm, count, total_amount=None):
+    rng = realm.rng
+    if total_amount:
+        amounts = rng.multinomial(total_amount, [1/count]*count)
+        for a in amounts:
+            dist = rng.random(1) * 100
+            angle = rng.random() * np.pi * 2
+            position = np.array([500, 500]) + [np.cos(angle), np.sin(angle)] * dist
+            realm.spawn_food(position, a)
+    else:
+        for _ in range(count):
+            position = np.array(realm.size) * rng.random(2)
+            amount = int(rng.random() * 50 + 50)
+            realm.spawn_food(position, amount)
+
+def spawn_predefined_food(realm, center, pattern):
+    food_patterns = {
+        "equal-cross": [
+            [center+(0,100), 500],
+            [center+(0,-100), 500],
+            [center+(100,0), 500],
+            [center+(-100,0), 500]
+        ],
+        "skewed-cross": [
+            [center+(0,100), 100],
+            [center+(0,-100), 1000],
+            [center+(100,0), 200],
+            [center+(-100,0), 200]
+        ],
+        "quick-test": [
+            [center+(0,70), 20],
+            [center+(0,-70), 20],
+            [center+(70,0), 20],
+            [center+(-70,0), 20]
+        ],
+    }
+    if pattern in food_patterns:
+        for position, amount in food_patterns[pattern]:
+            realm.spawn_food(position, amount)
+    else:
+        raise ValueError("Undefined pattern")
+    
+def progress_time(realm, colonies):
+    realm.profiler.start("tick")
+    for colony in colonies:
+        for ant in colony.ants:
+            ant.do()
+                   
+        colony.do()
+        colony.update()
+    realm.update()
+    realm.profiler.stop("tick")
+
+def setup_simulation(realm_size=(1000, 1000), nest_position=(500, 500),
+    evaporation=0.99, lazy_decay=True, sniff_field_interval=0,
+    sniff_radius=50, food_radius=30, starting_ants=30, noise=0.5,
+    pattern="equal-cross", batched=False, seed=None, tile_size=None, precision="float64", nest_positions=None,
+    boundary="remove"):
+    """
+    creates a realm with one colony and the food of the given pattern.
+    with nest_positions, there is a colony at each of the positions instead, each with its own pheromone channel,
+    and the food pattern is placed around the first one.
+    every random number of the simulation is derived from seed.
+    precision is the float type of the land, the sniffmatrix uses the matching complex type.
+    the land gets a halo as wide as the sniff radius, so ants can sniff up to the edge of the map.
+    boundary is what the colonies do with ants near the edge, see Colony. the default "remove" matches
+    the results in results/, "bounce" keeps the ants on the map, which nests off the center need.
+    returns the realm and the list of colonies.
+    """
+    positions = nest_positions if nest_positions is not None else [nest_position]
+    realm = Realm(size=realm_size, evaporation=evaporation, lazy_decay=lazy_decay,
+        sniff_field_interval=sniff_field_interval, seed=seed, tile_size=tile_size, dtype=precision,
+        halo=sniff_radius, channels=len(positions))
+    context = antmath.Context(sniff_radius*2, sniff_radius*2, dtype=antmath.complex_dtype(precision))
+    colony_class = SwarmColony if batched else Colony
+    colonies = [colony_class(realm=realm, nest_position=position,
+        starting_ants=starting_ants, chaotic_constant=4, noise=noise,
+        sniff_radius=sniff_radius, food_radius=food_radius, context=context, boundary=boundary)
+        for position in positions]
+    colony = colonies[0]
+
+    if pattern == "random":
+        spawn_random_food(realm, count=10, total_amount=2000)
+    else: spawn_predefined_food(realm, center=colony.position, pattern=pattern)
+    return realm, colonies
+
+def run_simulation(seed, max_ticks=None, trace_path=None, frames_path=None, frame_every=10,
+    trajectory_path=None, **settings):
+    """
+    runs one simulation until all food is collected, or until max_ticks.
+    settings are passed to setup_simulation.
+    returns the number of ticks, the food brought home, and the wall time in seconds.
+    with trace_path, the phases of every tick are profiled, the chrome trace is written to trace_path
+    and the summary of the profiler is added to the result.
+    with frames_path, a frame is drawn every frame_every ticks and written to frames_path, see FrameRecorder.
+    with trajectory_path, the state of every ant is recorded into trajectory_path, see TrajectoryRecorder.
+    """
+    realm, colonies = setup_simulation(seed=seed, **settings)
+    if trace_path:
+        realm.profiler = TickProfiler(enabled=True, trace=True)
+    recorder = None
+    if frames_path:
+        from framerecorder import FrameRecorder
+        max_frames = max_ticks // frame_every + 1 if max_ticks else 1000
+        recorder = FrameRecorder(realm, colonies, frames_path, every=frame_every, max_frames=max_frames)
+    trajectory = None
+    if trajectory_path:
+        from trajectory import TrajectoryRecorder
+        trajectory = TrajectoryRecorder(trajectory_path, realm, colonies)
+
+    start = time.perf_counter()
+    while len(realm.food_list) > 0:
+        if max_ticks is not None and realm.time >= max_ticks:
+            break
+        progress_time(realm, colonies)
+        if recorder:
+            recorder.record()
+        if trajectory:
+            trajectory.record()
+    seconds = time.perf_counter() - start
+
+    result = {
+        "ticks": realm.time,
+        "finished": len(realm.food_list) == 0,
+        "food": sum(colony.food for colony in colonies),
+        "seconds": seconds,
+    }
+    if recorder:
+        result["frames"] = recorder.close()
+    if trajectory:
+        trajectory.close()
+    if trace_path:
+        realm.profiler.export_chrome_trace(trace_path)
+        result["profile"] = realm.profiler.summary()
+    return result
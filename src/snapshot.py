@@ -0,0 +1,222 @@
+# publishes snapshots of a running simulation to a renderer in another process.
+import time
+import numpy as np
+from multiprocessing import Process, shared_memory
+from swarm import SwarmColony
+
+# kind of each entity row, also the index of its sprite
+FOOD, NEST, ANT, ANT_WITH_FOOD = range(4)
+
+# control words at the start of the shared memory
+SEQUENCE, FRONT, ACKNOWLEDGED, CLOSED = range(4)
+
+class SnapshotBuffers():
+    """
+    two copies of the land (as float32, already multiplied by the land scale) and of the entity rows,
+    laid out in one block of shared memory behind a few control words.
+
+    the publisher writes into the back copy, flips FRONT and increments SEQUENCE.
+    the renderer draws from the front copy and writes the sequence it took into ACKNOWLEDGED.
+    the publisher only writes again after that acknowledgement, so the copy the renderer
+    is drawing from is never written to, and every tick in between is dropped.
+    """
+    def __init__(self, shape, capacity, name=None):
+        self.shape = tuple(shape)
+        self.capacity = capacity
+        land_bytes = self.shape[0] * self.shape[1] * 4
+        entity_bytes = capacity * 4 * 8
+        meta_bytes = 2 * 8
+        self.buffer_bytes = land_bytes + entity_bytes + meta_bytes
+        size = 4 * 8 + 2 * self.buffer_bytes
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+        self.control = np.ndarray(4, dtype=np.int64, buffer=self.shm.buf)
+        self.land, self.entities, self.meta = [], [], []
+        for b in range(2):
+            offset = 4 * 8 + b * self.buffer_bytes
+            self.land.append(np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf, offset=offset))
+            offset += land_bytes
+            self.entities.append(np.ndarray((capacity, 4), dtype=np.float64, buffer=self.shm.buf, offset=offset))
+            offset += entity_bytes
+            self.meta.append(np.ndarray(2, dtype=np.int64, buffer=self.shm.buf, offset=offset)) # entity count, time
+
+    def close(self, unlink=False):
+        # the arrays point into the shared memory, and have to be released before it can be closed
+        self.control = self.land = self.entities = self.meta = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SnapshotPublisher():
+    def __init__(self, shape, capacity=65536, min_interval=1/30):
+        """
+        shape is the shape of the land, capacity the maximum number of entities in a snapshot,
+        more are not drawn. at most one snapshot is published every min_interval seconds.
+        """
+        self.buffers = SnapshotBuffers(shape, capacity)
+        self.min_interval = min_interval
+        self.last_publish = 0
+
+    @property
+    def name(self):
+        return self.buffers.name
+
+    def ready(self):
+        """
+        whether the renderer took the last snapshot and the minimum interval has passed.
+        """
+        control = self.buffers.control
+        return (control[ACKNOWLEDGED] == control[SEQUENCE]
+            and time.perf_counter() - self.last_publish >= self.min_interval)
+
+    def publish(self, realm, colonies):
+        """
+        writes a snapshot of the realm and the colonies if the renderer is ready for one,
+        otherwise returns immediately. returns whether a snapshot was written.
+        """
+        if not self.ready():
+            return False
+        realm.profiler.start("publish")
+        b = self.buffers
+        back = 1 - b.control[FRONT]
+        if realm.channels == 1:
+            h = realm.halo
+            land, scale = realm.land[h:h+realm.size[0], h:h+realm.size[1]], realm.land_scale
+        else:
+            land, scale = realm.get_slice(0, realm.size[0], 0, realm.size[1]), 1 # every channel together
+        np.multiply(land, scale, out=b.land[back], casting="same_kind")
+        b.meta[back][:] = (self._write_entities(b.entities[back], realm, colonies), realm.time)
+        b.control[FRONT] = back
+        b.control[SEQUENCE] += 1
+        self.last_publish = time.perf_counter()
+        realm.profiler.stop("publish")
+        return True
+
+    def _write_entities(self, rows, realm, colonies):
+        """
+        fills rows with x, y, heading and kind of the food, the nests and the ants. returns the number of rows.
+        """
+        count = 0
+        def put(positions, headings, kind):
+            nonlocal count
+            n = min(len(positions), len(rows) - count)
+            if n > 0:
+                rows[count:count+n, 0:2] = positions[:n]
+                rows[count:count+n, 2] = headings[:n]
+                rows[count:count+n, 3] = kind
+                count += n
+
+        if realm.food_list:
+            put(np.array([food.position for food in realm.food_list]), np.full(len(realm.food_list), 0.25), FOOD)
+        put(np.array([colony.position for colony in colonies]), np.full(len(colonies), 0.25), NEST)
+        for colony in colonies:
+            if isinstance(colony, SwarmColony):
+                positions, headings = colony.ant_position, colony.ant_heading
+                carrying = colony.ant_food != 0
+            elif colony.ants:
+                positions = np.array([ant.position for ant in colony.ants])
+                headings = np.array([ant.get_heading() for ant in colony.ants])
+                carrying = np.array([ant.food != 0 for ant in colony.ants])
+            else:
+                continue
+            put(positions[~carrying], headings[~carrying], ANT)
+            put(positions[carrying], headings[carrying], ANT_WITH_FOOD)
+        return count
+
+    def close(self):
+        """
+        tells the renderer to stop, and frees the shared memory.
+        """
+        self.buffers.control[CLOSED] = 1
+        self.buffers.close(unlink=True)
+
+
+class RealmSnapshot():
+    """
+    the part of a realm the visualizer reads, backed by one of the shared land copies.
+    """
+    def __init__(self, land, time):
+        self.land = land
+        self.time = time
+
+    def get_slice(self, left, right, top, bottom):
+        return self.land[left:right, top:bottom]
+
+
+class EntitySnapshot():
+    def __init__(self, row):
+        self.row = row
+
+    def get_position(self):
+        return (self.row[0], self.row[1])
+
+    def get_heading(self):
+        return self.row[2]
+
+    def get_arrows(self):
+        return {}
+
+
+class SnapshotReader():
+    def __init__(self, name, shape, capacity):
+        self.buffers = SnapshotBuffers(shape, capacity, name=name)
+        self.sequence = 0
+
+    def closed(self):
+        return self.buffers.control[CLOSED] != 0
+
+    def acquire(self):
+        """
+        takes the newest snapshot if there is one the reader did not take yet.
+        returns the realm snapshot and the entity rows, or None if there is nothing new.
+        """
+        control = self.buffers.control
+        sequence = int(control[SEQUENCE])
+        if sequence == self.sequence:
+            return None
+        front = int(control[FRONT])
+        count, tick = self.buffers.meta[front]
+        self.sequence = sequence
+        control[ACKNOWLEDGED] = sequence
+        return RealmSnapshot(self.buffers.land[front], tick), self.buffers.entities[front][:count]
+
+
+def _render(name, shape, capacity, sprite_paths, middle, tickrate, screensize):
+    """
+    the renderer process. draws the newest snapshot at its own frame rate until the publisher closes.
+    """
+    from pygamevisualizer import PygameVisualizer
+    reader = SnapshotReader(name, shape, capacity)
+    groups = [[] for _ in sprite_paths]
+    pgv = PygameVisualizer(list(zip(groups, sprite_paths)), tickrate=tickrate, screensize=screensize)
+    pgv.camera.middle = middle
+    realm = None
+    while not reader.closed():
+        snapshot = reader.acquire()
+        if snapshot:
+            realm, rows = snapshot
+            kinds = rows[:, 3].astype(int)
+            for kind, group in enumerate(groups):
+                group[:] = [EntitySnapshot(row) for row in rows[kinds == kind]]
+        pgv.step_frame(realm)
+    reader.buffers.close()
+
+
+def start_renderer(realm, sprite_paths, middle, tickrate=0, screensize=(1024, 800),
+    capacity=65536, min_interval=1/30):
+    """
+    starts the visualizer in a separate process. sprite_paths are the sprites of
+    the food, the nest, the ants, and the ants carrying food, in that order.
+    returns the publisher, whose publish(realm, colonies) is called after every tick,
+    and the process. the publisher has to be closed when the simulation ends.
+    """
+    publisher = SnapshotPublisher(realm.size, capacity, min_interval)
+    process = Process(target=_render, daemon=True,
+        args=(publisher.name, realm.size, capacity, sprite_paths, middle, tickrate, screensize))
+    process.start()
+    return publisher, process
@@ -0,0 +1,172 @@
+# runs every configuration only until its completion ticks are known well enough.
+# example: python stopping.py --noise 0 0.5 1 --patterns equal-cross skewed-cross --target-width 100 --max-runs 100
+import argparse
+import csv
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from sweep import FIELDS, _run, report_failure
+
+class RunningStats():
+    """
+    mean and variance updated one value at a time with Welford's algorithm,
+    and a bootstrap confidence interval of the median over the values seen so far.
+    censored counts the runs that stopped at max_ticks before they finished. their ticks are only
+    a lower bound of the completion ticks, so they are not part of the statistics.
+    failed counts the runs that raised.
+    """
+    def __init__(self, confidence=0.95, resamples=2000, seed=0):
+        self.confidence = confidence
+        self.resamples = resamples
+        self.rng = np.random.default_rng(seed)
+        self.values = []
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # sum of the squared differences from the mean
+        self.censored = 0
+        self.failed = 0
+
+    def add(self, value):
+        self.values.append(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def runs(self):
+        return self.count + self.censored + self.failed
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def median(self):
+        return np.median(self.values) if self.values else np.nan
+
+    def median_interval(self):
+        """
+        the bootstrap percentile interval of the median, (nan, nan) with fewer than two values.
+        """
+        if self.count < 2:
+            return np.nan, np.nan
+        values = np.asarray(self.values)
+        samples = values[self.rng.integers(0, self.count, size=(self.resamples, self.count))]
+        medians = np.median(samples, axis=1)
+        tail = (1 - self.confidence) / 2 * 100
+        low, high = np.percentile(medians, [tail, 100 - tail])
+        return low, high
+
+    def median_width(self):
+        low, high = self.median_interval()
+        return high - low
+
+
+def run_until_stable(configurations, settings, output, target_width, min_runs=10, max_runs=100,
+    first_seed=1, workers=None, confidence=0.95):
+    """
+    runs seeds of every (noise, pattern, ants) configuration, and stops adding seeds to a configuration
+    once the confidence interval of its median completion ticks is narrower than target_width,
+    after at least min_runs and at most max_runs runs.
+    the pool is kept busy with the configurations that are not settled yet. runs that were already
+    started when a configuration settled still finish, and are counted and written too.
+    every finished run is appended to the output csv as in sweep.py. returns configuration -> RunningStats.
+    runs that hit max_ticks of the settings are written too, but only counted as censored, so a configuration
+    whose runs do not finish never settles and runs until max_runs.
+    a run that raises is reported and counted as failed, the other runs keep going.
+    """
+    workers = workers or os.cpu_count()
+    stats = {c: RunningStats(confidence) for c in configurations}
+    next_seed = {c: first_seed for c in configurations}
+    running = {c: 0 for c in configurations}
+    settled = set()
+
+    def candidates():
+        return [c for c in configurations if c not in settled and next_seed[c] - first_seed < max_runs]
+
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    start = time.perf_counter()
+    with open(output, "a", newline="") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+        pending = {}
+        while True:
+            # fill the pool, giving the next seed to the configuration with the fewest runs
+            while len(pending) < workers and candidates():
+                c = min(candidates(), key=lambda c: stats[c].runs + running[c])
+                noise, pattern, ants = c
+                job = (noise, pattern, ants, next_seed[c], settings)
+                pending[pool.submit(_run, job)] = c, job
+                next_seed[c] += 1
+                running[c] += 1
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                c, job = pending.pop(future)
+                running[c] -= 1
+                try:
+                    result = future.result()
+                except Exception as error:
+                    report_failure(job, error)
+                    stats[c].failed += 1
+                    continue
+                writer.writerow({key: result[key] for key in FIELDS})
+                f.flush()
+                s = stats[c]
+                if result["finished"]:
+                    s.add(result["ticks"])
+                else:
+                    s.censored += 1
+                width = s.median_width()
+                if s.count >= min_runs and width < target_width:
+                    settled.add(c)
+                print(f"noise: {c[0]}, pattern: {c[1]}, ants: {c[2]}, runs: {s.count}, censored: {s.censored}, "
+                    f"median: {s.median():.0f}, interval width: {width:.0f}" + (", settled" if c in settled else ""))
+    print(f"{sum(s.runs for s in stats.values())} runs took {time.perf_counter() - start:.1f} s")
+    return stats
+
+def report(stats):
+    for (noise, pattern, ants), s in stats.items():
+        low, high = s.median_interval()
+        print(f"noise: {noise}, pattern: {pattern}, ants: {ants}, runs: {s.count}, "
+            f"censored at max ticks: {s.censored}" + (f", failed: {s.failed}" if s.failed else ""))
+        if s.count == 0:
+            print("    no run finished")
+            continue
+        print(f"    mean: {s.mean:.1f}, std: {s.std:.1f}, median: {s.median():.1f}, "
+            f"{s.confidence:.0%} interval of the median: [{low:.1f}, {high:.1f}]")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run each configuration until its median is known well enough.")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0, 0.5, 1])
+    parser.add_argument("--patterns", nargs="+", default=["equal-cross", "skewed-cross", "random"])
+    parser.add_argument("--ants", type=int, nargs="+", default=[30])
+    parser.add_argument("--target-width", type=float, required=True,
+        help="stop a configuration when the interval of its median ticks is narrower than this")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--min-runs", type=int, default=10)
+    parser.add_argument("--max-runs", type=int, default=100)
+    parser.add_argument("--first-seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--batched", action="store_true", help="use SwarmColony")
+    parser.add_argument("--precision", choices=["float64", "float32"], default="float64")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    configurations = [(noise, pattern, ants)
+        for noise in args.noise for pattern in args.patterns for ants in args.ants]
+    settings = {"batched": args.batched, "max_ticks": args.max_ticks, "precision": args.precision}
+    stats = run_until_stable(configurations, settings, args.output, args.target_width,
+        args.min_runs, args.max_runs, args.first_seed, args.workers, args.confidence)
+    report(stats)
+
+if __name__ == "__main__":
+    main()
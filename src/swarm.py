@@ -0,0 +1,357 @@
+import numpy as np
+import antmath
+from numpy.lib.stride_tricks import sliding_window_view
+from ant import Ant, Colony, AntModes
+
+"""
+    Structure-of-arrays version of the ants.
+
+    Instead of one Ant object per ant, a SwarmColony keeps the state of all of its ants
+    in contiguous numpy arrays, and advances all of them with a handful of array operations per tick.
+    The behaviour follows Ant.do and Ant.walk, so the two colony types can be used interchangeably
+    with progress_time in main.py.
+"""
+
+class AntView():
+    """
+    read-only view of a single ant in a swarm, used by the visualizer which expects entities
+    with get_position() and get_heading().
+    """
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+    def get_position(self):
+        p = self.swarm.ant_position[self.index]
+        return (p[0], p[1])
+
+    def get_heading(self):
+        return self.swarm.ant_heading[self.index]
+
+    def get_arrows(self):
+        return {}
+
+
+class SwarmColony(Colony):
+    def __init__(self, realm, nest_position, sniff_radius, food_radius,
+        starting_ants=0, starting_food=0,
+        noise=0, chaotic_constant=4, context=None, rng=None, boundary="remove"):
+        """
+        [ant states]
+        ant_position: N times 2 array of the current ant positions
+        ant_heading: heading of each ant in exponent form
+        ant_turning: the chaotic variable of each ant
+        ant_mode: AntModes value of each ant
+        ant_food: amount of food each ant is carrying
+
+        next_position and next_food hold the pending changes, which are applied in update().
+        the constants to be tuned, like the grab amount and the walk speed, are the class attributes of Ant.
+        ants stays an empty list, so that progress_time only calls do() and update() of the colony.
+        the realm needs a halo of at least sniff_radius, so that every window the ants sniff is complete.
+        """
+        if realm.halo < sniff_radius:
+            raise ValueError("a swarm colony needs a realm with a halo of at least the sniff radius")
+        # ant states
+        self.position = np.array(nest_position)
+        self._allocate(0)
+        self.pending_ants = 0
+
+        super(SwarmColony, self).__init__(realm, nest_position, sniff_radius, food_radius,
+            starting_ants=starting_ants, starting_food=starting_food,
+            noise=noise, chaotic_constant=chaotic_constant, context=context, rng=rng, boundary=boundary)
+        self.smell_range = self.sniff_radius
+        self.food_range = self.food_radius
+
+    def _allocate(self, n):
+        self.ant_position = np.zeros((n, 2))
+        self.ant_heading = np.zeros(n)
+        self.ant_turning = np.zeros(n)
+        self.ant_mode = np.full(n, AntModes.searching.value, dtype=np.int8)
+        self.ant_food = np.zeros(n)
+        self.ant_birth_time = np.zeros(n)
+        self.next_position = np.zeros((n, 2))
+        self.next_food = np.zeros(n)
+
+    def __len__(self):
+        return len(self.ant_heading)
+
+    def spawn_ant(self):
+        # ants are added in bulk during the next update tick
+        self.pending_ants += 1
+
+    def _add_pending_ants(self):
+        n = self.pending_ants
+        if n == 0:
+            return
+        self.pending_ants = 0
+
+        heading = self.rng.random(n)
+        turning = self.rng.random(n)
+        while (turning == 0).any():
+            turning[turning == 0] = self.rng.random(np.count_nonzero(turning == 0))
+
+        position = np.tile(np.asarray(self.position, dtype=float), (n, 1))
+        self.ant_position = np.concatenate((self.ant_position, position))
+        self.next_position = np.concatenate((self.next_position, position))
+        self.ant_heading = np.concatenate((self.ant_heading, heading))
+        self.ant_turning = np.concatenate((self.ant_turning, turning))
+        self.ant_mode = np.concatenate((self.ant_mode, np.full(n, AntModes.searching.value, dtype=np.int8)))
+        self.ant_food = np.concatenate((self.ant_food, np.zeros(n)))
+        self.next_food = np.concatenate((self.next_food, np.zeros(n)))
+        self.ant_birth_time = np.concatenate((self.ant_birth_time, np.full(n, self.realm.time)))
+
+    def get_ant_positions(self):
+        return self.ant_position.copy(), self.position
+
+    def get_ant_views(self, carrying=None):
+        """
+        returns AntView objects for the visualizer.
+        carrying=True or False only returns the ants with or without food.
+        """
+        if carrying is None:
+            indices = range(len(self))
+        elif carrying:
+            indices = np.flatnonzero(self.ant_food != 0)
+        else:
+            indices = np.flatnonzero(self.ant_food == 0)
+        return [AntView(self, i) for i in indices]
+
+    def _distance_to_nest(self, positions):
+        return np.linalg.norm(positions - self.position, axis=1)
+
+    def _direction_to(self, positions, targets):
+        return antmath.vectors_to_headings(targets - positions)
+
+    def _search_food(self, indices):
+        """
+        batched version of Ant.search_food.
+        returns the index of the nearest food within food_range in realm.food_list (-1 if none) and its distance.
+        """
+        self.realm.profiler.start("search_food")
+        result = self.realm.search_food(self.ant_position[indices], self.food_range)
+        self.realm.profiler.stop("search_food")
+        return result
+
+    def _sniff(self, indices):
+        """
+        batched version of Ant.sniff. returns the direction and magnitude of the smell for each ant.
+        """
+        direction = np.zeros(len(indices))
+        magnitude = np.zeros(len(indices))
+        land = self.realm.lands[self.channel]
+        scale = self.realm.land_scale # the line and the direction do not depend on the scale
+        small_r = self.smell_range//5
+        big_r = self.smell_range
+        home = self._direction_to(self.ant_position[indices], self.position)
+        profiler = self.realm.profiler
+
+        # start by assuming that the ants are on a trail
+        profiler.start("sniff.trail")
+        p = self.ant_position[indices].astype(int) + self.realm.halo # positions in the stored land
+        offsets = np.arange(-small_r, small_r)
+        xs = p[:, 0, None] + offsets
+        ys = p[:, 1, None] + offsets
+        windows = land[xs[:, :, None], ys[:, None, :]]
+        line = antmath.detect_straight_lines(windows)
+        total = np.sum(windows, axis=(1, 2))
+
+        on_trail = np.isfinite(line) & (line != 0)
+        towards_home = np.abs(home - line) < 0.25 #line direction is towards home
+        direction[on_trail] = np.where(towards_home, (line + 0.5)%1, line)[on_trail]
+        magnitude[on_trail] = total[on_trail] * scale
+        off_trail = np.flatnonzero(~on_trail)
+        profiler.stop("sniff.trail")
+
+        # ants that are not on a trail use the sniffmatrix
+        if len(off_trail) == 0:
+            return direction, magnitude
+        profiler.start("sniff.matrix")
+        if self.realm.sniff_field_interval:
+            direction_raw = self.realm.get_sniff_vectors(self.ant_position[indices[off_trail]], self.context.sniffmatrix,
+                self.channel)
+        else:
+            direction_raw = sniff_matrix_sums(land, p[off_trail], big_r, self.context.sniff_columns) * scale
+        mag = np.abs(direction_raw)
+        smelled = mag > 0.1
+        direction[off_trail[smelled]] = antmath.complex_to_headings(direction_raw[smelled])
+        magnitude[off_trail[smelled]] = mag[smelled]
+        profiler.stop("sniff.matrix")
+        return direction, magnitude
+
+    def _grab(self, indices, food_index):
+        """
+        ants take food one after another, in the same order as the object based colony does.
+        """
+        food_list = self.realm.food_list
+        amounts = np.array([f.amount for f in food_list], dtype=float)
+        order = np.argsort(food_index, kind="stable")
+        sorted_food = food_index[order]
+        # amount of food already taken by ants earlier in the same tick
+        before = np.arange(len(sorted_food)) - np.searchsorted(sorted_food, sorted_food)
+        available = amounts[sorted_food] - before * Ant.grab_amount
+        taken = np.zeros(len(indices))
+        taken[order] = np.clip(available, 0, Ant.grab_amount)
+        self.next_food[indices] = taken
+
+        total = np.bincount(food_index, weights=taken, minlength=len(food_list))
+        for f, t in zip(food_list, total):
+            if t: f.take(t)
+
+    def _walk(self, indices, targets=None):
+        """
+        batched version of Ant.walk.
+        targets is either None (the ants sniff for a direction) or an array of target positions.
+        """
+        if len(indices) == 0:
+            return
+        self.realm.profiler.start("walk")
+        c = self.chaotic_constant
+        # chaotic turning
+        t = self.ant_turning[indices]
+        t = c * t * (1 - t)
+        self.ant_turning[indices] = t
+
+        # intermediate heading.
+        c_base = t * 4 / c - 0.5
+        r_base = antmath.random(size=len(indices), rng=self.rng) - 0.5
+        h = self.ant_heading[indices] + (c_base * (1-self.noise) + r_base * self.noise) / 10
+
+        if targets is None:
+            s_base, mag_sniff = self._sniff(indices)
+            sniffed = mag_sniff > Ant.threshold_sniff
+            h[sniffed] += _angle_towards(h[sniffed], s_base[sniffed], maxturn=0.05, mix=0.5)
+        else:
+            target_heading = self._direction_to(self.ant_position[indices], targets)
+            h += _angle_towards(h, target_heading, maxturn=0.2, mix=0.8)
+        self.ant_heading[indices] = h
+
+        step = antmath.headings_to_vectors(h, self.context.heading_table)
+        next_position = self.ant_position[indices] + step * Ant.walk_speed
+
+        outside = ((next_position < 0) | (next_position > self.realm.size)).any(axis=1)
+        if outside.any():
+            if self.boundary != "bounce":
+                raise IndexError("The ant has escaped the map")
+            # ants that bump into the edge of the map stay where they are and turn around
+            self.ant_heading[indices[outside]] += 0.5
+            next_position[outside] = self.ant_position[indices[outside]]
+        self.next_position[indices] = next_position
+        self.realm.profiler.stop("walk")
+
+    def _make_pheromones(self, indices):
+        self.realm.deposits.put_many(self.ant_position[indices].astype(int), Ant.pheromone_amount, self.channel)
+
+    def do(self):
+        """
+        advances every ant by one tick. see Ant.do for the behaviour of a single ant.
+        """
+        if len(self) == 0:
+            return
+        searching = AntModes.searching.value
+        returning = AntModes.returning.value
+        too_far = AntModes.returning_due_to_distance.value
+
+        mode = self.ant_mode
+        p = self.ant_position
+        self.next_position[:] = p
+        self.next_food[:] = self.ant_food
+        home_distance = self._distance_to_nest(p)
+        at_home = home_distance < self.range
+
+        # ants that are returning and reached home drop their food.
+        dropping = (mode != searching) & at_home
+        self.new_food += int(np.sum(self.ant_food[dropping])) # an int like the food of the object colony
+        self.next_food[dropping] = 0
+
+        # searching ants, and ants that went too far but are not home yet, look for food.
+        looking = np.flatnonzero((mode == searching) | ((mode == too_far) & ~at_home))
+        food_index, food_dist = self._search_food(looking)
+        found = food_index >= 0
+        if found.any():
+            amounts = np.array([f.amount for f in self.realm.food_list], dtype=float)
+            reach = np.maximum(3, np.minimum(np.sqrt(amounts[food_index[found]])/2, self.food_range/2))
+            grab = np.zeros(len(looking), dtype=bool)
+            grab[found] = food_dist[found] < reach
+        else:
+            grab = np.zeros(len(looking), dtype=bool)
+        to_food = found & ~grab
+
+        grabbing = looking[grab]
+        if len(grabbing):
+            self._grab(grabbing, food_index[grab])
+
+        food_positions = self.realm.food_index.positions
+        self._walk(looking[to_food], food_positions[food_index[to_food]])
+
+        wandering = looking[~found & (mode[looking] == searching)]
+        self._walk(wandering)
+
+        homing = np.concatenate((
+            np.flatnonzero((mode == returning) & ~at_home),
+            looking[~found & (mode[looking] == too_far)]))
+        self._make_pheromones(np.flatnonzero((mode == returning) & ~at_home))
+        self._walk(homing, self.position)
+
+        # mode changes
+        new_mode = mode.copy()
+        new_mode[dropping] = searching
+        new_mode[grabbing] = returning
+        new_mode[wandering[home_distance[wandering] > Ant.too_far_away]] = too_far
+        self.ant_mode = new_mode
+
+    def update(self):
+        self.realm.profiler.start("colony.update")
+        if len(self):
+            outside = self._distance_to_nest(self.ant_position) > min(self.realm.size)/2 - 60
+            if self.boundary == "remove" and outside.any():
+                print(f"{np.count_nonzero(outside)} ants were removed because they were near the boundary")
+                self._remove(~outside)
+            self.ant_position = self.next_position.copy()
+            self.ant_food = self.next_food.copy()
+
+        # add newborn ants to the roster
+        self._add_pending_ants()
+
+        # update the state variables related to the nest itself
+        self.food += self.new_food
+        self.new_food = 0
+        self.realm.profiler.stop("colony.update")
+
+    def _remove(self, keep):
+        for name in ("ant_position", "ant_heading", "ant_turning", "ant_mode", "ant_food",
+                     "ant_birth_time", "next_position", "next_food"):
+            setattr(self, name, getattr(self, name)[keep])
+
+
+def sniff_matrix_sums(land, positions, r, sniff_columns, chunk=16):
+    """
+    the sum of the sniffmatrix times the 2r times 2r window of land around each of the N times 2 positions,
+    as N complex values. sniff_columns is the sniffmatrix as a real matrix, see antmath.Context.
+    the windows are gathered chunk ants at a time and multiplied with the matrix in one product,
+    a small chunk keeps the gathered windows in the cache, see sniff_matrix in bench_hotpaths.py.
+    every window has to lie inside of the stored land, which the halo of the realm ensures.
+    """
+    positions = np.asarray(positions, dtype=np.intp).reshape(-1, 2)
+    assert ((positions - r >= 0) & (positions + r <= land.shape)).all(), "sniff window outside of the land"
+    if isinstance(land, np.ndarray):
+        windows = sliding_window_view(land, (2*r, 2*r))
+        def gather(q):
+            return windows[q[:, 0] - r, q[:, 1] - r]
+    else:
+        offsets = np.arange(-r, r)
+        def gather(q):
+            return land[(q[:, 0, None] + offsets)[:, :, None], (q[:, 1, None] + offsets)[:, None, :]]
+    sums = np.empty((len(positions), 2), dtype=np.result_type(land.dtype, sniff_columns.dtype))
+    for start in range(0, len(positions), chunk):
+        q = positions[start:start+chunk]
+        sums[start:start+chunk] = gather(q).reshape(len(q), -1) @ sniff_columns
+    return sums[:, 0] + 1j * sums[:, 1]
+
+def _angle_towards(heading, target, maxturn=0.05, mix=1):
+    """
+    array version of angle_towards in Ant.walk.
+    """
+    diff = target - heading
+    diff = np.where(np.abs(diff) > 0.5, diff - np.sign(diff), diff)
+    diff = np.clip(diff, -maxturn, maxturn)
+    return diff * mix
@@ -0,0 +1,116 @@
+# runs a grid of simulations headless, spread over all cores.
+# example: python sweep.py --noise 0 0.5 1 --patterns equal-cross skewed-cross random --runs 100
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation import run_simulation
+
+FIELDS = ["noise", "pattern", "ants", "seed", "ticks", "finished", "food", "seconds"]
+
+def _run(job):
+    noise, pattern, ants, seed, settings = job
+    settings = dict(settings)
+    trace_dir = settings.pop("trace_dir", None)
+    if trace_dir:
+        settings["trace_path"] = os.path.join(trace_dir, f"trace_{noise}_{pattern}_{ants}_{seed}.json")
+    frames_dir = settings.pop("frames_dir", None)
+    trajectory_dir = settings.pop("trajectory_dir", None)
+    record_seeds = settings.pop("record_seeds", None)
+    recorded = not record_seeds or seed in record_seeds
+    if frames_dir and recorded:
+        settings["frames_path"] = os.path.join(frames_dir, f"frames_{noise}_{pattern}_{ants}_{seed}")
+    if trajectory_dir and recorded:
+        settings["trajectory_path"] = os.path.join(trajectory_dir, f"trajectory_{noise}_{pattern}_{ants}_{seed}")
+    result = run_simulation(seed, noise=noise, pattern=pattern, starting_ants=ants, **settings)
+    result.update(noise=noise, pattern=pattern, ants=ants, seed=seed)
+    return result
+
+def make_jobs(noises, patterns, ant_counts, seeds, settings):
+    """
+    every combination of the settings, in the same order as the results in graphs_and_results.py.
+    """
+    return [(noise, pattern, ants, seed, settings)
+        for noise, pattern, ants, seed in itertools.product(noises, patterns, ant_counts, seeds)]
+
+def report_failure(job, error):
+    """
+    prints the job of a run that raised, and the error with its traceback, to stderr.
+    """
+    noise, pattern, ants, seed, _ = job
+    print(f"run failed, noise: {noise}, pattern: {pattern}, ants: {ants}, seed: {seed}", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+def run_sweep(jobs, output, workers=None):
+    """
+    runs the jobs on a process pool, and appends a row to the output csv file as soon as a run finishes.
+    a run that raises is reported and skipped, the others keep running. returns the jobs that failed.
+    """
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    start = time.perf_counter()
+    failed = []
+    with open(output, "a", newline="") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+        futures = {pool.submit(_run, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as error:
+                report_failure(futures[future], error)
+                failed.append(futures[future])
+                continue
+            writer.writerow({key: result[key] for key in FIELDS})
+            f.flush()
+            print(f"{done}/{len(jobs)}, noise: {result['noise']}, pattern: {result['pattern']}, "
+                f"seed: {result['seed']}, {result['ticks']} ticks in {result['seconds']:.1f} s")
+    print(f"sweep of {len(jobs)} runs took {time.perf_counter() - start:.1f} s"
+        + (f", {len(failed)} failed" if failed else ""))
+    return failed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a sweep of ant simulations without visualisation.")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0, 0.5, 1])
+    parser.add_argument("--patterns", nargs="+", default=["equal-cross", "skewed-cross", "random"])
+    parser.add_argument("--ants", type=int, nargs="+", default=[30])
+    parser.add_argument("--runs", type=int, default=100, help="number of seeds per configuration")
+    parser.add_argument("--first-seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--batched", action="store_true", help="use SwarmColony")
+    parser.add_argument("--precision", choices=["float64", "float32"], default="float64")
+    parser.add_argument("--output", default="sweep_results.csv")
+    parser.add_argument("--trace-dir", default=None,
+        help="profile every run and write its chrome trace into this directory")
+    parser.add_argument("--frames-dir", default=None,
+        help="draw frames of the runs without a display, a png directory per run in this directory")
+    parser.add_argument("--trajectory-dir", default=None,
+        help="record the ants of the runs into this directory, replay them with trajectory.py")
+    parser.add_argument("--record-seeds", type=int, nargs="+", default=None,
+        help="only record frames and trajectories of the runs with these seeds")
+    parser.add_argument("--frame-every", type=int, default=10, help="ticks between recorded frames")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    seeds = range(args.first_seed, args.first_seed + args.runs)
+    settings = {"batched": args.batched, "max_ticks": args.max_ticks, "precision": args.precision}
+    if args.trace_dir:
+        os.makedirs(args.trace_dir, exist_ok=True)
+        settings["trace_dir"] = args.trace_dir
+    if args.frames_dir:
+        settings.update(frames_dir=args.frames_dir, frame_every=args.frame_every)
+    if args.trajectory_dir:
+        settings["trajectory_dir"] = args.trajectory_dir
+    if args.frames_dir or args.trajectory_dir:
+        settings["record_seeds"] = args.record_seeds
+    jobs = make_jobs(args.noise, args.patterns, args.ants, seeds, settings)
+    run_sweep(jobs, args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+import time
+import numpy as np
+
+class TickProfiler():
+    """
+    measures the phases of a tick with perf_counter_ns, without needing pygame.
+    the simulation calls start(phase) and stop(phase) around each phase, both return immediately when disabled.
+
+    for every phase it keeps the number of calls, the total time, and the durations of the
+    last window calls, from which percentiles and histograms are computed.
+    phases may be nested, like sniff inside walk. the times are self times: the time of a phase started
+    while another one is open is only counted by the inner phase, so that the totals add up to the tick.
+    with trace, every call is also recorded as a chrome trace event (up to max_trace_events),
+    which can be opened in chrome://tracing or https://ui.perfetto.dev
+    """
+    def __init__(self, enabled=False, window=10000, trace=False, max_trace_events=1000000):
+        self.enabled = enabled
+        self.window = window
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+        self.reset()
+
+    def reset(self):
+        self.open = {} # phase -> [begin, time spent in the phases nested in it]
+        self.stack = [] # the open phases, innermost last
+        self.calls = {}
+        self.total_ns = {}
+        self.recent = {} # phase -> ring buffer of the last window durations in ns
+        self.events = []
+        self.origin = time.perf_counter_ns()
+
+    def start(self, phase):
+        if not self.enabled:
+            return
+        self.open[phase] = [time.perf_counter_ns(), 0]
+        self.stack.append(phase)
+
+    def stop(self, phase):
+        if not self.enabled:
+            return
+        end = time.perf_counter_ns()
+        begin, nested = self.open.pop(phase)
+        self.stack.remove(phase)
+        elapsed = end - begin
+        if self.stack:
+            self.open[self.stack[-1]][1] += elapsed
+        duration = elapsed - nested
+
+        calls = self.calls.get(phase, 0)
+        if calls == 0:
+            self.total_ns[phase] = 0
+            self.recent[phase] = np.zeros(self.window, dtype=np.int64)
+        self.recent[phase][calls % self.window] = duration
+        self.calls[phase] = calls + 1
+        self.total_ns[phase] += duration
+
+        if self.trace and len(self.events) < self.max_trace_events:
+            self.events.append((phase, begin, elapsed)) # the trace viewers show the nesting themselves
+
+    def durations(self, phase):
+        """
+        returns the durations of the last window calls of the phase in ns.
+        """
+        calls = self.calls.get(phase, 0)
+        return self.recent[phase][:min(calls, self.window)] if calls else np.zeros(0, dtype=np.int64)
+
+    def histogram(self, phase, bins=20):
+        """
+        histogram of the recent durations of the phase, with logarithmic bins in ns.
+        returns the counts and the bin edges.
+        """
+        d = self.durations(phase)
+        if len(d) == 0:
+            return np.zeros(bins, dtype=int), np.zeros(bins + 1)
+        edges = np.logspace(np.log10(max(d.min(), 1)), np.log10(max(d.max(), 2)), bins + 1)
+        return np.histogram(d, bins=edges)
+
+    def summary(self):
+        """
+        returns phase -> calls, total time in ms, and mean and percentiles of the recent calls in us.
+        """
+        result = {}
+        for phase, calls in self.calls.items():
+            d = self.durations(phase) / 1000
+            p50, p90, p99 = np.percentile(d, [50, 90, 99])
+            result[phase] = {
+                "calls": calls,
+                "total_ms": self.total_ns[phase] / 1e6,
+                "mean_us": self.total_ns[phase] / calls / 1000,
+                "p50_us": p50, "p90_us": p90, "p99_us": p99,
+            }
+        return result
+
+    def report(self):
+        summary = sorted(self.summary().items(), key=lambda s: -s[1]["total_ms"])
+        for phase, s in summary:
+            print(f"{phase:16s} calls: {s['calls']:9d}  total: {s['total_ms']:10.1f} ms  mean: {s['mean_us']:9.1f} us"
+                f"  p50: {s['p50_us']:9.1f} us  p90: {s['p90_us']:9.1f} us  p99: {s['p99_us']:9.1f} us")
+
+    def export_chrome_trace(self, path):
+        """
+        writes the recorded events in the chrome trace event format.
+        """
+        events = [{
+            "name": phase, "cat": phase.split(".")[0], "ph": "X",
+            "ts": (begin - self.origin) / 1000, "dur": duration / 1000, "pid": 0, "tid": 0,
+        } for phase, begin, duration in self.events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
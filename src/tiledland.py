@@ -0,0 +1,147 @@
+import numpy as np
+
+class TiledLand():
+    """
+    sparse storage for the pheromone land, made of square tiles that are only allocated where pheromone was deposited.
+    tiles whose values all decayed below an epsilon are retired again by retire(),
+    so the memory use follows the trails instead of the size of the realm.
+
+    it can be used in place of the dense land array of the realm:
+    land[left:right, top:bottom]    returns a dense copy of the region, zeros where there are no tiles
+    land[rows, cols]                gathers values at integer index arrays
+    land[rows, cols] = values       scatters values, allocating tiles as needed
+    land *= rate                    scales every tile
+    np.asarray(land)                builds the whole dense array
+    """
+    def __init__(self, shape, tile_size=64, dtype=np.float64, capacity=64):
+        self.shape = tuple(shape)
+        self.tile_size = tile_size
+        self.dtype = np.dtype(dtype)
+        grid = (-(-self.shape[0] // tile_size), -(-self.shape[1] // tile_size))
+        self.tile_index = np.full(grid, -1, dtype=np.int32) # slot of each tile in the pool, -1 if not allocated
+        self.pool = np.zeros((capacity, tile_size, tile_size), dtype=self.dtype)
+        self.tile_coords = np.zeros((capacity, 2), dtype=np.intp) # grid coordinates of each slot
+        self.used = 0 # slots below this have been handed out at least once
+        self.free = [] # retired slots that can be reused
+
+    @classmethod
+    def from_dense(cls, array, tile_size=64):
+        land = cls(array.shape, tile_size, array.dtype)
+        rows, cols = np.nonzero(array)
+        land[rows, cols] = array[rows, cols]
+        return land
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def tile_count(self):
+        return self.used - len(self.free)
+
+    def nbytes(self):
+        return self.pool.nbytes + self.tile_index.nbytes
+
+    def _grow(self, n):
+        capacity = len(self.pool)
+        while capacity < n:
+            capacity *= 2
+        pool = np.zeros((capacity,) + self.pool.shape[1:], dtype=self.dtype)
+        pool[:self.used] = self.pool[:self.used]
+        coords = np.zeros((capacity, 2), dtype=np.intp)
+        coords[:self.used] = self.tile_coords[:self.used]
+        self.pool, self.tile_coords = pool, coords
+
+    def _allocate(self, tiles):
+        """
+        allocates the tiles with the given grid coordinates (a N times 2 array of distinct tiles).
+        """
+        n = len(tiles)
+        reused = [self.free.pop() for _ in range(min(n, len(self.free)))]
+        fresh = n - len(reused)
+        if self.used + fresh > len(self.pool):
+            self._grow(self.used + fresh)
+        slots = np.array(reused + list(range(self.used, self.used + fresh)), dtype=np.intp)
+        self.used += fresh
+        self.tile_coords[slots] = tiles
+        self.tile_index[tiles[:, 0], tiles[:, 1]] = slots
+
+    def _locate(self, rows, cols):
+        t = self.tile_size
+        slots = self.tile_index[rows // t, cols // t]
+        return slots, rows % t, cols % t
+
+    def __getitem__(self, key):
+        rows, cols = key
+        if isinstance(rows, slice) and isinstance(cols, slice):
+            return self._get_region(rows, cols)
+        rows, cols = np.broadcast_arrays(np.asarray(rows), np.asarray(cols))
+        slots, r, c = self._locate(rows, cols)
+        values = self.pool[np.maximum(slots, 0), r, c]
+        return np.where(slots >= 0, values, 0).astype(self.dtype, copy=False)
+
+    def __setitem__(self, key, values):
+        rows, cols = key
+        rows, cols = np.broadcast_arrays(np.asarray(rows), np.asarray(cols))
+        rows, cols = rows.ravel(), cols.ravel()
+        values = np.broadcast_to(values, rows.shape)
+        t = self.tile_size
+        slots = self.tile_index[rows // t, cols // t]
+        missing = slots < 0
+        if missing.any():
+            tiles = np.unique(np.stack((rows[missing] // t, cols[missing] // t), axis=1), axis=0)
+            self._allocate(tiles)
+            slots = self.tile_index[rows // t, cols // t]
+        self.pool[slots, rows % t, cols % t] = values
+
+    def _get_region(self, rows, cols):
+        r0, r1, rs = rows.indices(self.shape[0])
+        c0, c1, cs = cols.indices(self.shape[1])
+        if rs != 1 or cs != 1:
+            raise IndexError("TiledLand only supports slices with step 1")
+        out = np.zeros((max(r1 - r0, 0), max(c1 - c0, 0)), dtype=self.dtype)
+        if out.size == 0:
+            return out
+        t = self.tile_size
+        for tr in range(r0 // t, (r1 - 1) // t + 1):
+            for tc in range(c0 // t, (c1 - 1) // t + 1):
+                slot = self.tile_index[tr, tc]
+                if slot < 0:
+                    continue
+                # overlap of the tile and the requested region, in land coordinates
+                a0, a1 = max(r0, tr*t), min(r1, (tr+1)*t)
+                b0, b1 = max(c0, tc*t), min(c1, (tc+1)*t)
+                out[a0-r0:a1-r0, b0-c0:b1-c0] = self.pool[slot, a0-tr*t:a1-tr*t, b0-tc*t:b1-tc*t]
+        return out
+
+    def __imul__(self, factor):
+        self.pool[:self.used] *= factor
+        return self
+
+    def __array__(self, dtype=None, copy=None):
+        out = self[0:self.shape[0], 0:self.shape[1]]
+        return out if dtype is None else out.astype(dtype)
+
+    def retire(self, epsilon):
+        """
+        frees every tile in which all values are below epsilon. returns the number of retired tiles.
+        """
+        if self.used == 0:
+            return 0
+        peak = np.abs(self.pool[:self.used]).reshape(self.used, -1).max(axis=1)
+        is_free = np.zeros(self.used, dtype=bool)
+        is_free[self.free] = True
+        retired = np.flatnonzero((peak < epsilon) & ~is_free)
+        if len(retired) == 0:
+            return 0
+        self.pool[retired] = 0
+        coords = self.tile_coords[retired]
+        self.tile_index[coords[:, 0], coords[:, 1]] = -1
+        self.free.extend(retired.tolist())
+        return len(retired)
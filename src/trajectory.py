@@ -0,0 +1,190 @@
+# records the state of every ant during a run, and replays the recording in the visualizer.
+# example: python trajectory.py runs/trajectory_0.5_equal-cross_30_1 --start 1500
+import argparse
+import bisect
+import json
+import os
+import numpy as np
+from swarm import SwarmColony
+from snapshot import EntitySnapshot
+
+ASSETS_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'assets')
+
+class TrajectoryRecorder():
+    def __init__(self, path, realm, colonies, every=1, chunk_ticks=256):
+        """
+        records position, heading, mode and food of every ant, and the food in the realm,
+        every `every` ticks into the directory path.
+        the ticks are collected in memory and written as a compressed chunk of columns every chunk_ticks
+        recorded ticks, so the memory use does not grow with the length of the run.
+        """
+        self.path = path
+        self.realm = realm
+        self.colonies = colonies
+        self.every = every
+        self.chunk_ticks = chunk_ticks
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "realm_size": list(realm.size),
+                "nests": [list(map(float, colony.position)) for colony in colonies],
+                "every": every,
+                "chunk_ticks": chunk_ticks,
+            }, f)
+        self._clear()
+
+    def _clear(self):
+        self.ticks = []
+        self.columns = {name: [] for name in
+            ("ant_position", "ant_heading", "ant_mode", "ant_food", "ant_colony", "food_position", "food_amount")}
+        self.ant_counts = []
+        self.food_counts = []
+
+    def record(self):
+        """
+        called after every tick, stores the state when the time is a multiple of every.
+        """
+        if self.realm.time % self.every != 0:
+            return
+        c = self.columns
+        ant_count = 0
+        for i, colony in enumerate(self.colonies):
+            if isinstance(colony, SwarmColony):
+                c["ant_position"].append(colony.ant_position.astype(np.float32))
+                c["ant_heading"].append(colony.ant_heading.astype(np.float32))
+                c["ant_mode"].append(colony.ant_mode.astype(np.int8))
+                c["ant_food"].append(colony.ant_food.astype(np.float32))
+                n = len(colony)
+            else:
+                ants = colony.ants
+                n = len(ants)
+                c["ant_position"].append(np.array([ant.position for ant in ants], dtype=np.float32).reshape(n, 2))
+                c["ant_heading"].append(np.array([ant.heading for ant in ants], dtype=np.float32))
+                c["ant_mode"].append(np.array([ant.mode.value for ant in ants], dtype=np.int8))
+                c["ant_food"].append(np.array([ant.food for ant in ants], dtype=np.float32))
+            c["ant_colony"].append(np.full(n, i, dtype=np.int8))
+            ant_count += n
+        food = self.realm.food_list
+        c["food_position"].append(np.array([f.position for f in food], dtype=np.float32).reshape(len(food), 2))
+        c["food_amount"].append(np.array([f.amount for f in food], dtype=np.float32))
+        self.ticks.append(self.realm.time)
+        self.ant_counts.append(ant_count)
+        self.food_counts.append(len(food))
+        if len(self.ticks) >= self.chunk_ticks:
+            self.flush()
+
+    def flush(self):
+        """
+        writes the collected ticks as one chunk, named by its first tick.
+        """
+        if not self.ticks:
+            return
+        chunk = {name: np.concatenate(parts) for name, parts in self.columns.items()}
+        chunk["ticks"] = np.array(self.ticks, dtype=np.int64)
+        chunk["ant_offsets"] = np.concatenate(([0], np.cumsum(self.ant_counts)))
+        chunk["food_offsets"] = np.concatenate(([0], np.cumsum(self.food_counts)))
+        np.savez_compressed(os.path.join(self.path, f"chunk_{self.ticks[0]:09d}.npz"), **chunk)
+        self._clear()
+
+    def close(self):
+        self.flush()
+
+
+class TrajectoryReader():
+    def __init__(self, path):
+        """
+        reads a recording of TrajectoryRecorder. only one chunk is kept in memory at a time.
+        """
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        names = sorted(name for name in os.listdir(path) if name.startswith("chunk_") and name.endswith(".npz"))
+        self.chunk_names = names
+        self.chunk_starts = [int(name[len("chunk_"):-len(".npz")]) for name in names]
+        if not names:
+            raise ValueError(f"no chunks in {path}")
+        self.chunk = None
+        self.chunk_index = None
+
+    def first_tick(self):
+        return self.chunk_starts[0]
+
+    def last_tick(self):
+        return int(self._load(len(self.chunk_names) - 1)["ticks"][-1])
+
+    def _load(self, index):
+        if index != self.chunk_index:
+            with np.load(os.path.join(self.path, self.chunk_names[index])) as data:
+                self.chunk = {name: data[name] for name in data.files}
+            self.chunk_index = index
+        return self.chunk
+
+    def frame(self, tick):
+        """
+        returns the recorded state at the last recorded tick at or before tick, as a dict with
+        the tick and the ant and food columns of that tick.
+        """
+        index = max(bisect.bisect_right(self.chunk_starts, tick) - 1, 0)
+        chunk = self._load(index)
+        i = max(np.searchsorted(chunk["ticks"], tick, side="right") - 1, 0)
+        a0, a1 = chunk["ant_offsets"][i], chunk["ant_offsets"][i+1]
+        f0, f1 = chunk["food_offsets"][i], chunk["food_offsets"][i+1]
+        frame = {"tick": int(chunk["ticks"][i])}
+        for name in ("ant_position", "ant_heading", "ant_mode", "ant_food", "ant_colony"):
+            frame[name] = chunk[name][a0:a1]
+        for name in ("food_position", "food_amount"):
+            frame[name] = chunk[name][f0:f1]
+        return frame
+
+
+def replay(path, start=None, speed=1, tickrate=40, screensize=(1024, 800)):
+    """
+    replays a recording in the visualizer, advancing speed ticks per frame.
+    p pauses, the left and right arrows seek 100 ticks, page up and page down seek 1000 ticks.
+    the pheromones are not recorded, so only the ants, the food and the nests are drawn.
+    """
+    import pygame as pg
+    from pygamevisualizer import PygameVisualizer
+    reader = TrajectoryReader(path)
+    food, nests, ants, ants_with_food = [], [], [], []
+    sprites = [os.path.join(ASSETS_PATH, name) for name in ("food.png", "home.png", "ant.png", "ant_with_food.png")]
+    pgv = PygameVisualizer(list(zip([food, nests, ants, ants_with_food], sprites)), tickrate=tickrate, screensize=screensize)
+    nests[:] = [EntitySnapshot((x, y, 0.25)) for x, y in reader.meta["nests"]]
+    pgv.camera.middle = np.array(reader.meta["nests"][0])
+
+    first, last = reader.first_tick(), reader.last_tick()
+    state = {"tick": first if start is None else start, "paused": False}
+    def seek(offset):
+        state["tick"] = min(max(state["tick"] + offset, first), last)
+    def pause():
+        state["paused"] = not state["paused"]
+    pgv.key_callbacks.update({
+        pg.K_LEFT: lambda: seek(-100), pg.K_RIGHT: lambda: seek(100),
+        pg.K_PAGEDOWN: lambda: seek(-1000), pg.K_PAGEUP: lambda: seek(1000),
+        pg.K_p: pause,
+    })
+
+    while pgv.running:
+        frame = reader.frame(state["tick"])
+        rows = np.column_stack((frame["ant_position"], frame["ant_heading"]))
+        carrying = frame["ant_food"] != 0
+        ants[:] = [EntitySnapshot(row) for row in rows[~carrying]]
+        ants_with_food[:] = [EntitySnapshot(row) for row in rows[carrying]]
+        food[:] = [EntitySnapshot((x, y, 0.25)) for x, y in frame["food_position"]]
+        pg.display.set_caption(f"Ants, tick {frame['tick']} of {last}")
+        pgv.step_frame()
+        if not state["paused"]:
+            seek(speed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded trajectory.")
+    parser.add_argument("path")
+    parser.add_argument("--start", type=int, default=None, help="tick to start from")
+    parser.add_argument("--speed", type=int, default=1, help="ticks per frame")
+    parser.add_argument("--tickrate", type=int, default=40, help="frames per second")
+    args = parser.parse_args(argv)
+    replay(args.path, args.start, args.speed, args.tickrate)
+
+if __name__ == "__main__":
+    main()
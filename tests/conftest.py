@@ -0,0 +1,17 @@
+# the modules in src import each other by their plain names, as when they are run from src.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'src'))
+
+import antmath
+
+@pytest.fixture(autouse=True, scope="session")
+def sniffmatrix_cache_dir(tmp_path_factory):
+    """
+    keeps the sniffmatrix files of the tests out of the cache/ directory of the repository.
+    """
+    antmath.matrix_cache_dir = str(tmp_path_factory.mktemp("cache"))
+    yield antmath.matrix_cache_dir
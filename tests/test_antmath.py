@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import antmath
+
+def reference_detect_straight_line(image):
+    """
+    the loop and polyfit implementation detect_straight_lines replaced.
+    """
+    a = np.argmax(image, axis=0)
+    b = np.argmax(image, axis=1)
+    x_raw = np.concatenate((np.arange(len(a)), b))
+    y_raw = np.concatenate((a, np.arange(len(b))))
+    x = [xr for xr, yr in zip(x_raw, y_raw) if xr != 0 and yr != 0]
+    y = [yr for xr, yr in zip(x_raw, y_raw) if xr != 0 and yr != 0]
+    if len(x) <= 3:
+        return None
+    if np.std(x) >= np.std(y):
+        inc = np.polyfit(x, y, deg=1)[0]
+        incj = np.cos(inc) + np.sin(inc)*1j
+    else:
+        inc = np.polyfit(y, x, deg=1)[0]
+        incj = np.sin(inc) + np.cos(inc)*1j
+    return antmath.complex_to_exponent(incj)
+
+def images(count=300, size=20, seed=0):
+    rng = np.random.default_rng(seed)
+    result = []
+    for k in range(count):
+        image = np.zeros((size, size))
+        kind = k % 3
+        if kind == 0: # random values everywhere
+            image = rng.random((size, size))
+        elif kind == 1: # a line with a random slope and offset
+            slope, offset = rng.uniform(-2, 2), rng.uniform(0, size)
+            rows = np.arange(size)
+            cols = (offset + slope * (rows - size/2)).astype(int)
+            keep = (cols >= 0) & (cols < size)
+            image[rows[keep], cols[keep]] = 10
+            if rng.random() < 0.5:
+                image = image.T
+        else: # sparse noise, sometimes too little for a line
+            image[rng.random((size, size)) < rng.uniform(0, 0.1)] = rng.random() * 10
+        result.append(image)
+    return np.array(result)
+
+def test_detect_straight_lines_matches_the_reference():
+    stack = images()
+    batched = antmath.detect_straight_lines(stack)
+    for image, inclination in zip(stack, batched):
+        expected = reference_detect_straight_line(image)
+        single = antmath.detect_straight_line(image)
+        if expected is None:
+            assert np.isnan(inclination) and single is None
+        else:
+            difference = abs(inclination - expected) % 1
+            assert min(difference, 1 - difference) < 1e-9
+            assert single == inclination
+
+def test_headings_to_vectors_matches_the_complex_form():
+    headings = np.random.default_rng(1).random(100) * 3 - 1
+    expected = [antmath.imag_to_array(np.e ** (2j * np.pi * h)) for h in headings]
+    np.testing.assert_allclose(antmath.headings_to_vectors(headings), expected, atol=1e-12)
+    table = antmath.HeadingTable(4096)
+    np.testing.assert_allclose(antmath.headings_to_vectors(headings, table), expected, atol=2*np.pi/4096)
+
+def test_vectors_to_headings_matches_direction_to_exponent():
+    vectors = np.random.default_rng(2).normal(size=(100, 2))
+    expected = [antmath.direction_to_exponent(v) for v in vectors]
+    np.testing.assert_allclose(antmath.vectors_to_headings(vectors), expected)
+
+def test_random_follows_the_logistic_map_distribution():
+    samples = antmath.random(size=200000, rng=np.random.default_rng(3))
+    assert ((samples >= 0) & (samples < 1)).all()
+    # the cumulative distribution of the invariant density is 2/pi*arcsin(sqrt(x))
+    for x in (0.1, 0.25, 0.5, 0.9):
+        assert np.mean(samples <= x) == pytest.approx(2/np.pi*np.arcsin(np.sqrt(x)), abs=0.005)
+
+def test_sniffmatrix_cache_ignores_files_of_other_builders(tmp_path, monkeypatch):
+    monkeypatch.setattr(antmath, "matrix_cache_dir", str(tmp_path))
+    monkeypatch.setattr(antmath, "matrix_cache", {})
+    # a file of an older builder, under the name without the builder hash
+    np.save(tmp_path / "sniffmatrix_8x8_complex128.npy", np.ones((8, 8), dtype=np.complex128))
+    built = antmath._build_sniffmatrix(8, 8, np.complex128)
+    np.testing.assert_array_equal(antmath.get_sniffmatrix(8, 8), built)
+
+    monkeypatch.setattr(antmath, "matrix_cache", {})
+    assert len(list(tmp_path.glob(f"*_{antmath._sniffmatrix_builder_hash()}.npy"))) == 1
+    np.testing.assert_array_equal(antmath.get_sniffmatrix(8, 8), built) # loaded from the file this time
+
+def test_sniffmatrix_is_built_when_the_cache_dir_is_unusable(tmp_path, monkeypatch):
+    monkeypatch.setattr(antmath, "matrix_cache", {})
+    blocked = tmp_path / "not-a-directory"
+    blocked.write_text("") # makedirs and the writes below it fail
+    built = antmath._build_sniffmatrix(8, 8, np.complex128)
+    np.testing.assert_array_equal(antmath.get_sniffmatrix(8, 8, cache_dir=str(blocked / "cache")), built)
+    assert blocked.read_text() == ""
+
+def test_sniffmatrix_cache_rebuilds_damaged_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(antmath, "matrix_cache", {})
+    path = antmath._matrix_cache_path(str(tmp_path), 8, 8, np.complex128)
+    open(path, "wb").close()
+    built = antmath._build_sniffmatrix(8, 8, np.complex128)
+    np.testing.assert_array_equal(antmath.get_sniffmatrix(8, 8, cache_dir=str(tmp_path)), built)
+    np.testing.assert_array_equal(np.load(path), built) # replaced by the rebuilt matrix
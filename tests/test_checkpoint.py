@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from checkpoint import save_checkpoint, load_checkpoint, fork_checkpoint
+from simulation import setup_simulation, progress_time
+
+def ant_state(colonies):
+    """
+    positions, headings and food of every ant, for both colony types.
+    """
+    state = []
+    for colony in colonies:
+        if colony.ants:
+            state.append(np.array([[*ant.position, ant.heading, ant.food] for ant in colony.ants]))
+        else:
+            state.append(np.column_stack((colony.ant_position, colony.ant_heading, colony.ant_food)))
+    return state
+
+def assert_same(a, b):
+    (realm_a, colonies_a), (realm_b, colonies_b) = a, b
+    assert realm_a.time == realm_b.time
+    np.testing.assert_array_equal(realm_a.get_slice(0, realm_a.size[0], 0, realm_a.size[1]),
+        realm_b.get_slice(0, realm_b.size[0], 0, realm_b.size[1]))
+    for state_a, state_b in zip(ant_state(colonies_a), ant_state(colonies_b)):
+        np.testing.assert_array_equal(state_a, state_b)
+    assert [f.amount for f in realm_a.food_list] == [f.amount for f in realm_b.food_list]
+
+@pytest.mark.parametrize("batched", [False, True])
+@pytest.mark.parametrize("seed", [3, np.int64(3)])
+def test_restore_continues_identically(tmp_path, batched, seed):
+    realm, colonies = setup_simulation(realm_size=(300, 300), nest_position=(150, 150), starting_ants=10,
+        pattern="quick-test", batched=batched, seed=seed)
+    for _ in range(50):
+        progress_time(realm, colonies)
+    save_checkpoint(tmp_path, realm, colonies)
+    restored = load_checkpoint(tmp_path)
+    assert_same((realm, colonies), restored)
+
+    for _ in range(100):
+        progress_time(realm, colonies)
+        progress_time(*restored)
+    assert_same((realm, colonies), restored)
+
+def test_restore_several_colonies(tmp_path):
+    realm, colonies = setup_simulation(realm_size=(300, 300), starting_ants=5, pattern="quick-test",
+        nest_positions=[(150, 150), (100, 200)], seed=7)
+    for _ in range(30):
+        progress_time(realm, colonies)
+    save_checkpoint(tmp_path, realm, colonies)
+    restored = load_checkpoint(tmp_path)
+    assert [c.channel for c in restored[1]] == [0, 1]
+    for _ in range(50):
+        progress_time(realm, colonies)
+        progress_time(*restored)
+    assert_same((realm, colonies), restored)
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_fork_applies_the_variations(tmp_path, batched):
+    realm, colonies = setup_simulation(realm_size=(300, 300), nest_position=(150, 150), starting_ants=10,
+        pattern="quick-test", batched=batched, seed=11)
+    for _ in range(50):
+        progress_time(realm, colonies)
+    save_checkpoint(tmp_path, realm, colonies)
+    assert realm.land_scale != 1
+
+    loaded = load_checkpoint(tmp_path)
+    same, noisy, reseeded, eager = fork_checkpoint(tmp_path,
+        [{}, {"noise": 0.2}, {"seed": 99}, {"lazy_decay": False}])
+
+    # without variations a fork continues like a restored simulation
+    assert_same(loaded, same)
+    for _ in range(50):
+        progress_time(*loaded)
+        progress_time(*same)
+    assert_same(loaded, same)
+
+    assert [c.noise for c in noisy[1]] == [0.2]
+    assert [c.noise for c in reseeded[1]] == [colonies[0].noise]
+
+    # the new random streams make the children walk differently
+    restored = load_checkpoint(tmp_path)
+    for _ in range(50):
+        progress_time(*restored)
+        progress_time(*reseeded)
+    assert not np.array_equal(ant_state(restored[1])[0], ant_state(reseeded[1])[0])
+
+    eager_realm = eager[0]
+    assert not eager_realm.lazy_decay
+    assert eager_realm.land_scale == 1
+    np.testing.assert_allclose(eager_realm.get_slice(0, 300, 0, 300), realm.get_slice(0, 300, 0, 300), rtol=1e-12)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from ant import Realm, Colony, Entity
+
+class Marker(Entity):
+    __slots__ = ("position", "next_position")
+    buffered = ("position",)
+
+def test_entity_update_swaps_in_the_next_values():
+    marker = Marker(Realm((10, 10)))
+    with pytest.raises(ValueError):
+        marker.get_position()
+    marker.position, marker.next_position = np.array([1.0, 2.0]), np.array([3.0, 4.0])
+    marker.update()
+    assert marker.get_position() == (3.0, 4.0) and marker.next_position is None
+    marker.update() # None means no change
+    assert marker.get_position() == (3.0, 4.0)
+
+def test_ant_applies_position_and_food_in_update():
+    colony = Colony(Realm((100, 100)), (50, 50), sniff_radius=10, food_radius=5, starting_ants=1)
+    ant = colony.ants[0]
+    assert not hasattr(ant, "__dict__")
+    ant.next_position = np.array([51.0, 50.0])
+    ant.next_food = 10
+    assert ant.get_position() == (50, 50) and ant.food == 0
+    ant.update()
+    assert ant.get_position() == (51.0, 50.0) and ant.food == 10
+    assert ant.next_position is None and ant.next_food is None
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from ant import Realm, DepositBuffer
+from simulation import setup_simulation, progress_time
+
+def run_deposits(dtype, ticks, evaporation=0.95):
+    realm = Realm((50, 50), evaporation=evaporation, lazy_decay=True, dtype=dtype)
+    for _ in range(ticks):
+        realm.deposits.put((25, 25), 10)
+        realm.update()
+    return realm
+
+def test_float32_lazy_decay_does_not_overflow():
+    # 0.95**2000 is far below the smallest float32, so the land has to be renormalized on the way
+    r32 = run_deposits(np.float32, 2000)
+    r64 = run_deposits(np.float64, 2000)
+    assert r32.land_scale >= r32.renormalize_below
+    assert np.isfinite(r32.land).all()
+    np.testing.assert_allclose(r32.get_slice(0, 50, 0, 50), r64.get_slice(0, 50, 0, 50), rtol=1e-4)
+    np.testing.assert_allclose(r64.get_slice(25, 26, 25, 26), 200, rtol=1e-6)
+
+def test_lazy_decay_matches_eager_decay():
+    lazy = run_deposits(np.float64, 300)
+    eager = Realm((50, 50), evaporation=0.95, lazy_decay=False)
+    for _ in range(300):
+        eager.deposits.put((25, 25), 10)
+        eager.update()
+    np.testing.assert_allclose(lazy.get_slice(0, 50, 0, 50), eager.get_slice(0, 50, 0, 50), rtol=1e-9)
+
+def test_deposit_buffer_sums_duplicates():
+    rng = np.random.default_rng(0)
+    positions = rng.integers(0, 5, size=(200, 2))
+    amounts = rng.random(200)
+    expected = np.zeros((1, 9, 9))
+    for (x, y), a in zip(positions, amounts):
+        expected[0, x + 2, y + 2] += a
+    buffer = DepositBuffer(capacity=4)
+    buffer.put_many(positions[:100], amounts[:100])
+    for p, a in zip(positions[100:], amounts[100:]):
+        buffer.put(p, a)
+    land = np.zeros((1, 9, 9))
+    buffer.flush(land, offset=2)
+    np.testing.assert_allclose(land, expected)
+    assert len(buffer) == 0
+
+@pytest.mark.parametrize("tile_size", [None, 16])
+def test_channels_keep_the_pheromone_of_each_colony_apart(tile_size):
+    realm = Realm((40, 40), halo=5, tile_size=tile_size)
+    assert [realm.claim_channel() for _ in range(3)] == [0, 1, 2]
+    realm.deposits.put((10, 10), 1, channel=0)
+    realm.deposits.put((10, 10), 2, channel=2)
+    realm.deposits.put((20, 30), 4, channel=1)
+    realm.update()
+    assert realm.get_slice(10, 11, 10, 11, channel=0)[0, 0] == 1
+    assert realm.get_slice(10, 11, 10, 11, channel=1)[0, 0] == 0
+    assert realm.get_slice(10, 11, 10, 11)[0, 0] == 3
+    assert realm.get_slice(0, 40, 0, 40).sum() == 7
+
+def final_state(realm, colonies, ticks):
+    for _ in range(ticks):
+        progress_time(realm, colonies)
+    positions = np.concatenate([colony.get_ant_positions()[0] for colony in colonies])
+    return realm.get_slice(0, realm.size[0], 0, realm.size[1]), positions, [f.amount for f in realm.food_list]
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_tiled_land_matches_dense_land(batched):
+    settings = dict(realm_size=(300, 300), nest_position=(150, 150), starting_ants=10,
+        pattern="quick-test", batched=batched, seed=5)
+    dense = setup_simulation(**settings)
+    tiled = setup_simulation(tile_size=32, **settings)
+    tiled[0].retire_epsilon = 0
+    for a, b in zip(final_state(*dense, 400), final_state(*tiled, 400)):
+        np.testing.assert_array_equal(a, b)
+
+def test_one_nest_in_nest_positions_matches_nest_position():
+    settings = dict(realm_size=(300, 300), starting_ants=10, pattern="quick-test", seed=5)
+    single = setup_simulation(nest_position=(150, 150), **settings)
+    listed = setup_simulation(nest_positions=[(150, 150)], **settings)
+    for a, b in zip(final_state(*single, 300), final_state(*listed, 300)):
+        np.testing.assert_array_equal(a, b)
+
+def test_stack_is_allocated_once_for_all_colonies():
+    realm, colonies = setup_simulation(realm_size=(200, 200), starting_ants=1, pattern="quick-test",
+        nest_positions=[(60 + 20*k, 100) for k in range(5)])
+    assert realm.stack.shape == (5, 300, 300)
+    assert [colony.channel for colony in colonies] == list(range(5))
+    stack = realm.stack
+    realm.claim_channel() # one colony more than the realm was made for still gets a channel
+    assert realm.channels == 6 and realm.stack is not stack
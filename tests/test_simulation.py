@@ -0,0 +1,43 @@
+import pytest
+from ant import Realm, Colony
+from simulation import setup_simulation, progress_time
+
+# ant count, sum of the ant positions, sum of the land and food brought home after 400 ticks,
+# recorded before the pheromone channels, the halo and the slotted entities were added.
+RECORDED = {
+    (False, 1): (15, 5819.596679527616, 268.18168399504395, 80),
+    (False, 2): (15, 6528.8564466841435, 425.16569272337955, 80),
+    (True, 1): (15, 5770.616560106252, 312.6897232030143, 80),
+    (True, 2): (11, 4356.066576103667, 202.4056146301643, 60),
+}
+
+@pytest.mark.parametrize("batched, seed", list(RECORDED))
+def test_seeded_runs_match_the_recorded_results(batched, seed):
+    realm, colonies = setup_simulation(realm_size=(400, 400), nest_position=(200, 200), starting_ants=15,
+        pattern="quick-test", batched=batched, seed=seed)
+    for _ in range(400):
+        progress_time(realm, colonies)
+    positions = colonies[0].get_ant_positions()[0]
+    count, position_sum, land_sum, food = RECORDED[(batched, seed)]
+    assert len(positions) == count
+    assert positions.sum() == pytest.approx(position_sum, rel=1e-9)
+    assert realm.get_slice(0, 400, 0, 400).sum() == pytest.approx(land_sum, rel=1e-9)
+    assert colonies[0].food == food
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_bouncing_ants_stay_on_the_map(batched):
+    realm, colonies = setup_simulation(realm_size=(300, 300), starting_ants=20, pattern="quick-test",
+        nest_positions=[(90, 90), (240, 60)], batched=batched, seed=4, boundary="bounce")
+    for _ in range(500):
+        progress_time(realm, colonies)
+    for colony in colonies:
+        positions = colony.get_ant_positions()[0]
+        assert len(positions) == 20
+        assert ((positions >= 0) & (positions <= 300)).all()
+
+def test_bouncing_needs_a_halo():
+    realm = Realm((100, 100), halo=10)
+    with pytest.raises(ValueError):
+        Colony(realm, (50, 50), sniff_radius=20, food_radius=10, boundary="bounce")
+    with pytest.raises(ValueError):
+        Colony(realm, (50, 50), sniff_radius=10, food_radius=10, boundary="wrap")
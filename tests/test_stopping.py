@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from stopping import RunningStats, run_until_stable
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(0).normal(500, 50, size=200)
+    s = RunningStats(seed=1)
+    for v in values:
+        s.add(v)
+    assert s.mean == pytest.approx(np.mean(values))
+    assert s.std == pytest.approx(np.std(values, ddof=1))
+    low, high = s.median_interval()
+    assert low < np.median(values) < high
+
+def test_censored_runs_are_not_part_of_the_statistics(tmp_path):
+    # no run collects all the food in 20 ticks
+    configuration = (0.5, "quick-test", 5)
+    stats = run_until_stable([configuration], {"max_ticks": 20}, str(tmp_path / "runs.csv"),
+        target_width=1000, min_runs=2, max_runs=3, workers=2)
+    s = stats[configuration]
+    assert s.count == 0 and s.censored == 3
+    assert np.isnan(s.median())
+    assert len((tmp_path / "runs.csv").read_text().splitlines()) == 4
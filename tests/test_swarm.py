@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import antmath
+from ant import Realm
+from swarm import SwarmColony, sniff_matrix_sums
+from simulation import setup_simulation, progress_time
+
+def paired_simulations(ticks, starting_ants=20, noise=0, **settings):
+    """
+    an object colony and a swarm in the same world. the swarm starts with the ants of the object colony,
+    since the two draw their starting states from the random stream in a different order.
+    with noise=0 the random numbers drawn while walking do not change the walk.
+    the ants bounce off the edge, since the object colony skips the update of the ant after a removed one.
+    """
+    a = setup_simulation(realm_size=(400, 400), nest_position=(200, 200), starting_ants=starting_ants,
+        pattern="quick-test", noise=noise, seed=11, boundary="bounce", **settings)
+    b = setup_simulation(realm_size=(400, 400), nest_position=(200, 200), starting_ants=starting_ants,
+        pattern="quick-test", noise=noise, seed=11, batched=True, boundary="bounce", **settings)
+    ants, swarm = a[1][0].ants, b[1][0]
+    swarm.ant_position[:] = [ant.position for ant in ants]
+    swarm.ant_heading[:] = [ant.heading for ant in ants]
+    swarm.ant_turning[:] = [ant.turning for ant in ants]
+    swarm.next_position[:] = swarm.ant_position
+    for _ in range(ticks):
+        progress_time(*a)
+        progress_time(*b)
+    return a, b
+
+@pytest.mark.parametrize("ticks, settings", [(600, {}), (400, {"sniff_field_interval": 20})])
+def test_swarm_follows_the_object_ants(ticks, settings):
+    (realm_a, colonies_a), (realm_b, colonies_b) = paired_simulations(ticks, **settings)
+    ants, swarm = colonies_a[0].ants, colonies_b[0]
+    assert len(ants) == len(swarm)
+    np.testing.assert_allclose([ant.position for ant in ants], swarm.ant_position, atol=1e-6)
+    np.testing.assert_allclose([ant.heading for ant in ants], swarm.ant_heading, atol=1e-9)
+    np.testing.assert_array_equal([ant.mode.value for ant in ants], swarm.ant_mode)
+    np.testing.assert_array_equal([ant.food for ant in ants], swarm.ant_food)
+    assert colonies_a[0].food == colonies_b[0].food
+    np.testing.assert_allclose(realm_a.get_slice(0, 400, 0, 400), realm_b.get_slice(0, 400, 0, 400))
+
+@pytest.mark.parametrize("tile_size", [None, 32])
+def test_sniff_matrix_sums_match_the_window_sums(tile_size):
+    rng = np.random.default_rng(5)
+    r = 10
+    realm = Realm((80, 80), halo=r, tile_size=tile_size)
+    realm.deposits.put_many(rng.integers(0, 80, size=(300, 2)), rng.random(300) * 10)
+    realm.update()
+    context = antmath.Context(2*r, 2*r)
+    positions = rng.integers(0, 80, size=(40, 2)) + r
+    expected = [np.sum(np.asarray(realm.land)[x-r:x+r, y-r:y+r] * context.sniffmatrix) for x, y in positions]
+    np.testing.assert_allclose(sniff_matrix_sums(realm.land, positions, r, context.sniff_columns, chunk=16),
+        expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_food_brought_home_is_an_int(batched):
+    realm, colonies = setup_simulation(realm_size=(300, 300), nest_position=(150, 150), starting_ants=10,
+        pattern="quick-test", batched=batched, seed=5)
+    for _ in range(300):
+        progress_time(realm, colonies)
+    assert colonies[0].food > 0
+    assert isinstance(colonies[0].food, int)
+
+def test_swarm_needs_a_halo():
+    with pytest.raises(ValueError):
+        SwarmColony(Realm((100, 100), halo=10), (50, 50), sniff_radius=20, food_radius=10)
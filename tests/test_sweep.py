@@ -0,0 +1,21 @@
+import csv
+from sweep import make_jobs, run_sweep
+from stopping import run_until_stable
+
+def test_a_failing_run_does_not_stop_the_sweep(tmp_path):
+    output = str(tmp_path / "sweep.csv")
+    # setup_simulation raises for an unknown food pattern
+    jobs = make_jobs([0.5], ["quick-test", "no-such-pattern"], [5], [1, 2], {"max_ticks": 20})
+    failed = run_sweep(jobs, output, workers=2)
+    assert sorted(job[1] for job in failed) == ["no-such-pattern"] * 2
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(int(row["seed"]) for row in rows) == [1, 2]
+    assert all(row["pattern"] == "quick-test" for row in rows)
+
+def test_a_failing_run_does_not_stop_the_stopping_runs(tmp_path):
+    good, bad = (0.5, "quick-test", 5), (0.5, "no-such-pattern", 5)
+    stats = run_until_stable([good, bad], {"max_ticks": 20}, str(tmp_path / "runs.csv"),
+        target_width=1000, min_runs=2, max_runs=3, workers=2)
+    assert stats[bad].failed == 3 and stats[bad].count == 0
+    assert stats[good].censored == 3
@@ -0,0 +1,49 @@
+import json
+import tickprofiler
+from tickprofiler import TickProfiler
+
+def fake_clock(monkeypatch, times):
+    ticks = iter(times)
+    monkeypatch.setattr(tickprofiler.time, "perf_counter_ns", lambda: next(ticks))
+
+def test_nested_phases_count_their_self_time(monkeypatch):
+    # origin, then walk from 1000 to 9000 with sniff from 3000 to 7000 inside it, twice
+    fake_clock(monkeypatch, [0, 1000, 3000, 7000, 9000, 11000, 13000, 17000, 19000])
+    profiler = TickProfiler(enabled=True)
+    for _ in range(2):
+        profiler.start("walk")
+        profiler.start("sniff")
+        profiler.stop("sniff")
+        profiler.stop("walk")
+
+    summary = profiler.summary()
+    assert summary["walk"]["calls"] == 2
+    assert summary["sniff"]["calls"] == 2
+    assert profiler.total_ns == {"walk": 8000, "sniff": 8000}
+    assert list(profiler.durations("walk")) == [4000, 4000]
+    assert profiler.stack == [] and profiler.open == {}
+
+def test_disabled_profiler_records_nothing():
+    profiler = TickProfiler()
+    profiler.start("walk")
+    profiler.stop("walk")
+    assert profiler.summary() == {}
+
+def test_chrome_trace_round_trip(tmp_path, monkeypatch):
+    fake_clock(monkeypatch, [0, 1000, 3000, 7000, 9000])
+    profiler = TickProfiler(enabled=True, trace=True)
+    profiler.start("walk")
+    profiler.start("sniff.matrix")
+    profiler.stop("sniff.matrix")
+    profiler.stop("walk")
+
+    path = tmp_path / "trace.json"
+    profiler.export_chrome_trace(path)
+    with open(path) as f:
+        trace = json.load(f)
+    events = {e["name"]: e for e in trace["traceEvents"]}
+    assert len(trace["traceEvents"]) == 2
+    assert events["sniff.matrix"]["cat"] == "sniff"
+    assert (events["sniff.matrix"]["ts"], events["sniff.matrix"]["dur"]) == (3, 4)
+    assert (events["walk"]["ts"], events["walk"]["dur"]) == (1, 8) # the whole span, nesting is shown by the viewer
+    assert all(e["ph"] == "X" for e in trace["traceEvents"])